@@ -0,0 +1,51 @@
+import argparse
+import glob
+import logging
+import os
+import tempfile
+import time
+
+import finetuning.build as build
+import finetuning.model_io as model_io
+
+
+def benchmark(model, model_format, repetitions):
+    """
+    Measure export and load times of a model format.
+    :param model: Model.
+    :param model_format: Model format.
+    :param repetitions: Number of repetitions. The minimal times are reported.
+    :return: Tuple (time (s) for export, time (s) for loading, file size in bytes).
+    """
+    time_export = None
+    time_load = None
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, "model" + model_io.FORMATS[model_format])
+        for _ in range(repetitions):
+            start = time.time()
+            model_io.export_model(model, file, model_format)
+            end_export = time.time()
+            loaded = model_io.load_model(file, model_format)
+            end_load = time.time()
+            assert loaded.nr_states == model.nr_states and loaded.nr_transitions == model.nr_transitions
+            time_export = end_export - start if time_export is None else min(time_export, end_export - start)
+            time_load = end_load - end_export if time_load is None else min(time_load, end_load - end_export)
+        size = os.path.getsize(file)
+    return time_export, time_load, size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare export and load times of model formats.')
+    parser.add_argument('--files', help='glob of prism files to benchmark', default=os.path.join("..", "models", "*", "*-[3579].pm"))
+    parser.add_argument('--repetitions', help='number of repetitions per model and format', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.WARNING)
+
+    print("{:<45} {:>8} {:>10} {:<11} {:>10} {:>10} {:>12}".format("model", "states", "trans.", "format", "export(s)", "load(s)", "size(B)"))
+    for file in sorted(glob.glob(args.files)):
+        model, _, _, _, _ = build.build_model(file)
+        for model_format in model_io.FORMATS:
+            time_export, time_load, size = benchmark(model, model_format, args.repetitions)
+            print("{:<45} {:>8} {:>10} {:<11} {:>10.4f} {:>10.4f} {:>12}".format(os.path.basename(file), model.nr_states, model.nr_transitions, model_format,
+                                                                                  time_export, time_load, size))
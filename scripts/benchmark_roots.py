@@ -0,0 +1,58 @@
+import argparse
+import glob
+import logging
+import os
+import time
+
+import stormpy
+import stormpy.pars
+
+import finetuning.analyse as analyse
+import finetuning.build as build
+import finetuning.roots as roots
+
+
+def benchmark(model):
+    """
+    Compare root isolation with the z3 enumeration on all derivatives of a model.
+    :param model: Model.
+    :return: Tuple (no. derivatives, time (s) for z3, time (s) for root isolation, no. derivatives with different roots, maximal difference).
+    """
+    parameters = build.get_parameters(model)
+    no_derivatives = 0
+    time_z3 = 0
+    time_isolation = 0
+    no_mismatches = 0
+    max_difference = 0
+    for p in parameters:
+        for derivative in stormpy.pars.gather_derivatives(model, p):
+            no_derivatives += 1
+            start = time.time()
+            roots_z3 = sorted(float(o.as_decimal(10).replace("?", "")) for o in analyse.find_optimum_z3(derivative, p))
+            end_z3 = time.time()
+            roots_isolation = roots.find_roots(roots.polynomial_coefficients(derivative))
+            end_isolation = time.time()
+            time_z3 += end_z3 - start
+            time_isolation += end_isolation - end_z3
+            if len(roots_z3) != len(roots_isolation):
+                no_mismatches += 1
+                logging.warning("Different roots for {}: z3 {}, isolation {}".format(derivative, roots_z3, roots_isolation))
+            else:
+                for root_z3, root_isolation in zip(roots_z3, roots_isolation):
+                    max_difference = max(max_difference, abs(root_z3 - root_isolation))
+    return no_derivatives, time_z3, time_isolation, no_mismatches, max_difference
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare root isolation with z3 on the derivatives of the transition probabilities.')
+    parser.add_argument('--files', help='glob of prism files to benchmark', default=os.path.join("..", "models", "*", "*-[3579].pm"))
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.WARNING)
+
+    print("{:<45} {:>6} {:>10} {:>12} {:>10} {:>12}".format("model", "deriv.", "z3(s)", "isolation(s)", "mismatches", "max diff."))
+    for file in sorted(glob.glob(args.files)):
+        model, _, _, _, _ = build.build_model(file)
+        no_derivatives, time_z3, time_isolation, no_mismatches, max_difference = benchmark(model)
+        print("{:<45} {:>6} {:>10.4f} {:>12.4f} {:>10} {:>12.2e}".format(os.path.basename(file), no_derivatives, time_z3, time_isolation, no_mismatches,
+                                                                           max_difference))
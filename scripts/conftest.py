@@ -0,0 +1 @@
+# Makes the finetuning package importable for the tests in tests/
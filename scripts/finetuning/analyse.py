@@ -5,37 +5,81 @@ import pycarl
 import pycarl.cln as pc
 
 import finetuning.build as build
+import finetuning.roots as roots
 
 
-def gather_roots(model, parameters):
+def gather_derivatives(model, parameters):
     """
-    Compute all roots of the transition probabilities.
+    Collect the derivatives of all transition probabilities.
+    Derivatives with the same roots are only contained once per parameter.
     :param model: Model.
     :param parameters: Parameters.
-    :return: Dictionary of all roots for each parameter.
+    :return: List of tuples (parameter name, normalized derivative).
     """
-    roots = dict()
+    derivatives = []
     for p in parameters:
-        roots_p = set()
-        derivatives = stormpy.pars.gather_derivatives(model, p)
-        for derivative in derivatives:
+        normalized = set()
+        for derivative in stormpy.pars.gather_derivatives(model, p):
             # Only one parameter is allowed per derivative
             for var in parameters:
                 if var.name != p.name:
                     assert var.name not in str(derivative)
+            normalized.add(roots.normalize(roots.polynomial_coefficients(derivative)))
+        derivatives.extend((p.name, polynomial) for polynomial in sorted(normalized))
+    return derivatives
+
+
+def find_roots(polynomial):
+    """
+    Compute the roots of a single normalized derivative.
+    :param polynomial: Normalized polynomial.
+    :return: Tuple (polynomial, roots).
+    """
+    return polynomial, roots.find_roots(polynomial)
 
-            opt = find_optimum_z3(derivative, p)
-            for o in opt:
-                float_opt = o.as_decimal(10)
-                float_opt = float(float_opt.replace("?", ""))
-                roots_p.add(float_opt)
-        roots[p] = sorted(roots_p)
-    return roots
+
+def merge_roots(parameters, roots_per_derivative):
+    """
+    Merge the roots of all derivatives.
+    :param parameters: Parameters.
+    :param roots_per_derivative: Iterable of tuples (parameter name, roots of one derivative).
+    :return: Dictionary of all roots for each parameter.
+    """
+    roots_by_name = {p.name: set() for p in parameters}
+    for var_name, roots_derivative in roots_per_derivative:
+        roots_by_name[var_name].update(roots_derivative)
+    return {p: sorted(roots_by_name[p.name]) for p in parameters}
+
+
+def gather_roots(model, parameters, root_cache=None, map_function=map):
+    """
+    Compute all roots of the transition probabilities.
+    :param model: Model.
+    :param parameters: Parameters.
+    :param root_cache: Persistent cache of roots (optional).
+    :param map_function: Function used for computing the roots of all uncached derivatives, e.g., the map of a process pool.
+    :return: Dictionary of all roots for each parameter.
+    """
+    derivatives = gather_derivatives(model, parameters)
+    polynomials = sorted(set(polynomial for _, polynomial in derivatives))
+    known = dict()
+    if root_cache is not None:
+        for polynomial in polynomials:
+            roots_polynomial = root_cache.lookup(polynomial)
+            if roots_polynomial is not None:
+                known[polynomial] = roots_polynomial
+    missing = [polynomial for polynomial in polynomials if polynomial not in known]
+    logging.info("Derivatives: {} distinct, {} cached, {} to solve".format(len(polynomials), len(known), len(missing)))
+    new_roots = dict(map_function(find_roots, missing))
+    if root_cache is not None:
+        root_cache.store(new_roots)
+    known.update(new_roots)
+    return merge_roots(parameters, ((var_name, known[polynomial]) for var_name, polynomial in derivatives))
 
 
 def compute_rational_function(file):
     # Building
-    model, program, formula = build.build_model(file)
+    model, program, formula, _, _ = build.build_model(file)
     # Model checking
     result = stormpy.model_checking(model, formula)
     assert result.result_for_all_states
@@ -49,31 +93,22 @@ def compute_rational_function(file):
     return ratFunc
 
 
-def evaluate_rational_function(ratFunc, evaluations):
-    # Evaluation
-    result = []
-    for evaluation in evaluations:
-        # Convert values to pycarl number type
-        eval = {}
-        for var, val in evaluation.items():
-            eval[var] = pc.Rational(val)
-        value = ratFunc.evaluate(eval)
-        result.append(value)
-    return result
+def find_optimum_z3(func, var, timeout=5000):
+    return find_optimum_z3_smt2(func.to_smt2(), str(var), timeout)
 
 
-def find_optimum_z3(func, var, timeout=5000):
+def find_optimum_z3_smt2(func, var_name, timeout=5000):
     logging.debug("Checking {}".format(func))
     solver = z3.Solver()
     solver.set("timeout", timeout)
     # Set variable
-    z3_var = z3.Real(str(var))
+    z3_var = z3.Real(var_name)
     solver.add(z3_var > 0)
     solver.add(z3_var < 1)
 
     # Set function
-    constraint_str = "(assert ( = 0 {}))".format(func.to_smt2())
-    z3_constraint = z3.parse_smt2_string(constraint_str, decls={str(var): z3_var})
+    constraint_str = "(assert ( = 0 {}))".format(func)
+    z3_constraint = z3.parse_smt2_string(constraint_str, decls={var_name: z3_var})
     solver.add(z3_constraint)
 
     # Solve
@@ -101,4 +136,4 @@ def find_optimum_z3(func, var, timeout=5000):
 def compute_optimum(rat_func, var):
     derivative = rat_func.derive(var)
     logging.debug("Derivation of {}:\n{}".format(rat_func, derivative))
-    return find_optimum_z3(derivative.numerator, var)
+    return roots.find_roots(roots.polynomial_coefficients(derivative.numerator))
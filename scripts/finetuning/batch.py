@@ -0,0 +1,209 @@
+import glob
+import logging
+import math
+import multiprocessing
+import multiprocessing.connection
+import os
+import re
+import resource
+import time
+
+import finetuning.build as build
+import finetuning.cache as cache
+import finetuning.model_io as model_io
+
+
+class BuildJob:
+    """
+    Building of a single model file in a separate process.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        name = os.path.splitext(os.path.basename(file))[0]
+        match = re.search(r"(.*)-(\d+)$", name)
+        if match:
+            self.family = os.path.join(os.path.dirname(file), match.group(1))
+            self.size = int(match.group(2))
+        else:
+            self.family = os.path.join(os.path.dirname(file), name)
+            self.size = 0
+        self.name = name
+        self.estimate = None
+        self.process = None
+        self.connection = None
+        self.stats = None
+        self.error = None
+
+
+def collect_model_files(path):
+    """
+    Collect model files from directory or glob pattern.
+    :param path: Directory, glob pattern or single file.
+    :return: Sorted list of model files.
+    """
+    if os.path.isdir(path):
+        files = glob.glob(os.path.join(path, "*.pm"))
+    else:
+        files = glob.glob(path)
+    return sorted(files)
+
+
+def available_memory():
+    """
+    Get the physical memory of the system.
+    :return: Memory in MB.
+    """
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024 * 1024)
+
+
+def build_job(file, config, output_dir, connection):
+    """
+    Build and bisimulate a single model and export the quotient.
+    Executed in a separate process.
+    :param file: Model file.
+    :param config: Configuration.
+    :param output_dir: Output directory for the reduced model.
+    :param connection: Pipe to send statistics to the parent process.
+    """
+    try:
+        model, _, _, time_build, time_bisim = build.build_model(file, config.hybrid, sylvan_threads=1, sylvan_memory=config.memory_limit,
+                                                                cache=cache.get_model_cache(config))
+        model_file = os.path.join(output_dir, os.path.splitext(os.path.basename(file))[0] + model_io.FORMATS[config.model_format])
+        start_export = time.time()
+        model_io.export_model(model, model_file, config.model_format)
+        time_export = time.time() - start_export
+        # Peak memory of this process in MB (ru_maxrss is given in KB on Linux)
+        memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        connection.send({"states": model.nr_states, "transitions": model.nr_transitions, "time_build": time_build, "time_bisimulation": time_bisim,
+                         "time_export": time_export, "memory": memory})
+    except Exception as e:
+        connection.send({"error": "{}: {}".format(type(e).__name__, e)})
+    finally:
+        connection.close()
+
+
+class BatchBuilder:
+    """
+    Parallel building of all models of a family.
+    Jobs are scheduled according to their estimated memory consumption:
+    small models are packed together whereas large models get an exclusive slot.
+    """
+
+    def __init__(self, config, output_dir, memory_budget=None):
+        """
+        Constructor.
+        :param config: Configuration. The number of processes is used as the maximal number of parallel jobs.
+        :param output_dir: Output directory for the reduced models and the timings.
+        :param memory_budget: Memory (in MB) available for all jobs. If None, the physical memory of the system is used.
+        """
+        self.config = config
+        self.output_dir = output_dir
+        self.memory_budget = memory_budget if memory_budget is not None else available_memory()
+        self.measured = dict()  # Family -> list of tuples (size, peak memory)
+        self.baseline = None  # Memory of the smallest job, i.e., the overhead of the Python process
+
+    def estimate_memory(self, job):
+        """
+        Estimate the memory needed by a job by extrapolating the measurements of smaller models from the same family.
+        :param job: Build job.
+        :return: Estimated memory in MB.
+        """
+        measurements = [(size, memory) for size, memory in self.measured.get(job.family, []) if size <= job.size]
+        if not measurements:
+            # Assume an equal share of the budget
+            return self.memory_budget / self.config.processes
+        measurements.sort()
+        size_last, memory_last = measurements[-1]
+        model_last = max(memory_last - self.baseline, 1)
+        growth = 2.0  # Default growth per size step (state space of Herman doubles)
+        if len(measurements) > 1:
+            size_prev, memory_prev = measurements[-2]
+            model_prev = memory_prev - self.baseline
+            if size_last > size_prev and model_prev > 1 and model_last > model_prev:
+                growth = math.pow(model_last / model_prev, 1.0 / (size_last - size_prev))
+        return self.baseline + model_last * math.pow(growth, job.size - size_last)
+
+    def record(self, job):
+        memory = job.stats["memory"]
+        self.measured.setdefault(job.family, []).append((job.size, memory))
+        if self.baseline is None or memory < self.baseline:
+            self.baseline = memory
+
+    def start(self, job):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        job.process = multiprocessing.Process(target=build_job, args=(job.file, self.config, self.output_dir, sender))
+        job.connection = receiver
+        job.process.start()
+        sender.close()
+        logging.info("Started building {} (estimated memory {:.0f} MB)".format(job.file, job.estimate))
+
+    def finish(self, job):
+        try:
+            stats = job.connection.recv()
+        except EOFError:
+            stats = {"error": "Process terminated with exit code {}".format(job.process.exitcode)}
+        job.process.join()
+        job.connection.close()
+        if "error" in stats:
+            job.error = stats["error"]
+            logging.error("Building {} failed: {}".format(job.file, job.error))
+        else:
+            job.stats = stats
+            self.record(job)
+            logging.info("Built {}: {} states and {} transitions, building {:.3f}s, bisimulation {:.3f}s, memory {:.0f} MB".format(
+                job.file, stats["states"], stats["transitions"], stats["time_build"], stats["time_bisimulation"], stats["memory"]))
+
+    def build(self, files):
+        """
+        Build all given models.
+        :param files: Model files.
+        :return: List of finished build jobs.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        # Smaller models first to obtain measurements for estimating larger ones
+        pending = sorted((BuildJob(file) for file in files), key=lambda j: (j.size, j.family))
+        running = []
+        finished = []
+        while pending or running:
+            used = sum(job.estimate for job in running)
+            while pending and len(running) < self.config.processes:
+                job = pending[0]
+                job.estimate = self.estimate_memory(job)
+                if job.estimate >= self.memory_budget:
+                    # Exclusive slot: wait until all other jobs are finished
+                    if running:
+                        break
+                elif used + job.estimate > self.memory_budget:
+                    break
+                pending.pop(0)
+                self.start(job)
+                running.append(job)
+                used += job.estimate
+
+            # Wait for next job to finish
+            ready = multiprocessing.connection.wait([job.process.sentinel for job in running])
+            for job in list(running):
+                if job.process.sentinel in ready:
+                    self.finish(job)
+                    running.remove(job)
+                    finished.append(job)
+
+        self.export_timings(finished)
+        return finished
+
+    def export_timings(self, jobs):
+        """
+        Export statistics of build jobs as CSV file.
+        :param jobs: Finished build jobs.
+        """
+        csv_file = os.path.join(self.output_dir, "timings.csv")
+        with open(csv_file, 'w') as f:
+            f.write("file;states;transitions;time_build;time_bisimulation;time_export;memory;error")
+            for job in sorted(jobs, key=lambda j: (j.family, j.size)):
+                f.write("\n{};".format(os.path.basename(job.file)))
+                if job.stats is not None:
+                    f.write("{states};{transitions};{time_build};{time_bisimulation};{time_export};{memory};".format(**job.stats))
+                else:
+                    f.write(";;;;;;{}".format(job.error))
+        logging.info("Exported timings to {}".format(csv_file))
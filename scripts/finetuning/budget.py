@@ -0,0 +1,49 @@
+import time
+
+import finetuning.pla_helper as pla_helper
+
+
+class Budget:
+    """
+    Time and memory budget of the analysis.
+    PLA checks the budget regularly and stops gracefully with the results obtained so far when it is about to be exhausted.
+    """
+
+    def __init__(self, deadline=None, max_rss=None, memory_threshold=0.9, memory_interval=1):
+        """
+        Constructor.
+        :param deadline: Time (seconds since the epoch) at which the analysis must be finished. If None, the time is unbounded.
+        :param max_rss: Maximal memory (in MB) of all processes. If None, the memory is unbounded.
+        :param memory_threshold: Fraction of the maximal memory at which the budget is considered exhausted.
+        :param memory_interval: Minimal time (s) between two memory measurements.
+        """
+        self.deadline = deadline
+        self.max_rss = max_rss
+        self.memory_threshold = memory_threshold
+        self.memory_interval = memory_interval
+        self.pids = []  # Processes whose memory is accounted in addition to the current process
+        self.last_memory_check = 0
+
+    def memory_usage(self):
+        """
+        Get the memory of the current process and all registered processes.
+        The proportional set size is used such that memory shared between the processes (e.g., the model shared via fork) is only counted once.
+        :return: Memory in MB.
+        """
+        return pla_helper.get_proportional_memory_usage() + sum(pla_helper.get_proportional_memory_usage(pid) for pid in self.pids)
+
+    def exhausted(self, step_time=0):
+        """
+        Check whether the budget is about to be exhausted.
+        :param step_time: Expected time (s) of the next step. The time budget is exhausted if the next step cannot finish before the deadline.
+        :return: Reason if the budget is exhausted, otherwise None.
+        """
+        now = time.time()
+        if self.deadline is not None and now + step_time >= self.deadline:
+            return "deadline"
+        if self.max_rss is not None and now - self.last_memory_check >= self.memory_interval:
+            self.last_memory_check = now
+            memory = self.memory_usage()
+            if memory >= self.memory_threshold * self.max_rss:
+                return "memory ({:.0f} MB)".format(memory)
+        return None
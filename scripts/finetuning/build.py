@@ -4,7 +4,7 @@ import time
 import stormpy
 
 
-def build_model(file, hybrid=False, sylvan_threads=1, sylvan_memory=4096):
+def build_model(file, hybrid=False, sylvan_threads=1, sylvan_memory=4096, cache=None):
     """
     Build model from file and apply bisimulation.
     :param file: File.
@@ -12,6 +12,7 @@ def build_model(file, hybrid=False, sylvan_threads=1, sylvan_memory=4096):
                    If false, the model is built as a sparse model from the beginning.
     :param sylvan_threads: Number of threads to use in Sylvan library.
     :param sylvan_memory: Memory available to Sylvan.
+    :param cache: Model cache (optional). If given, the bisimulation quotient is loaded from the cache if possible.
     :return: Tuple (sparse model, prism program, property, time (s) for building , time (s) for bisimulation).
     """
     logging.debug("Build ({}) model for file {}".format("symbolic" if hybrid else "sparse", file))
@@ -25,6 +26,37 @@ def build_model(file, hybrid=False, sylvan_threads=1, sylvan_memory=4096):
     program, properties = stormpy.preprocess_prism_program(program, properties, "")
     program = program.as_prism_program()
 
+    model = None
+    if cache is not None:
+        cache_key = cache.compute_key(file, prop, hybrid)
+        model = cache.load(cache_key)
+
+    if model is not None:
+        # Use cached bisimulation quotient
+        time_build = time.time() - build_start
+        logging.info("Building model took {}s".format(time_build))
+        logging.info("Model after bisimulation: {} states and {} transitions.".format(model.nr_states, model.nr_transitions))
+        time_bisim = 0
+        logging.info("Computing bisimulation quotient took {}s".format(time_bisim))
+    else:
+        model, time_build, time_bisim = build_quotient(program, properties, hybrid, sylvan_threads, sylvan_memory, build_start)
+        if cache is not None:
+            cache.store(cache_key, model, time_build, time_bisim)
+
+    return model, program, properties[0], time_build, time_bisim
+
+
+def build_quotient(program, properties, hybrid, sylvan_threads, sylvan_memory, build_start):
+    """
+    Build model from program and compute the bisimulation quotient.
+    :param program: Prism program.
+    :param properties: Properties.
+    :param hybrid: If true, the model is built symbolically with BDDs and in the end converted to a sparse model.
+    :param sylvan_threads: Number of threads to use in Sylvan library.
+    :param sylvan_memory: Memory available to Sylvan.
+    :param build_start: Start time of building.
+    :return: Tuple (sparse model, time (s) for building , time (s) for bisimulation).
+    """
     if hybrid:
         # Set number of Sylvan threads to use
         stormpy.set_settings(["--sylvan:threads", str(sylvan_threads)])
@@ -50,15 +82,7 @@ def build_model(file, hybrid=False, sylvan_threads=1, sylvan_memory=4096):
     time_bisim = time.time() - build_end
     logging.info("Computing bisimulation quotient took {}s".format(time_bisim))
 
-    prop = properties[0]
-
-    # Simplify model (by eliminating constant transitions)
-    # Disabled for the moment as this leads to significantly more transitions in Herman
-    if False:
-        model, formula = stormpy.pars.simplify_model(model, prop.raw_formula)
-        logging.info("Model after simplification: {} states and {} transitions.".format(model.nr_states, model.nr_transitions))
-
-    return model, program, prop, time_build, time_bisim
+    return model, time_build, time_bisim
 
 
 def get_parameters(model):
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import stormpy
+
+import finetuning.model_io as model_io
+
+
+class ModelCache:
+    """
+    Persistent on-disk cache of bisimulation quotients.
+    Entries are content-addressed by the model file, the property, the building mode and the Storm version.
+    """
+
+    def __init__(self, directory, max_size=None, model_format="drn"):
+        """
+        Constructor.
+        :param directory: Cache directory. It is created if it does not exist.
+        :param max_size: Maximal size (in MB) of all cached models. If None, the cache is unbounded.
+        :param model_format: Format of the cached models (see model_io.FORMATS).
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.model_format = model_format
+        # Statistics of last lookup
+        self.hit = None
+        self.time_saved = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def compute_key(file, prop, hybrid):
+        """
+        Compute key for model cache.
+        :param file: Model file.
+        :param prop: Property string.
+        :param hybrid: Whether the model is built symbolically.
+        :return: Hash key.
+        """
+        h = hashlib.sha256()
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        h.update(prop.encode())
+        h.update(b"symbolic" if hybrid else b"sparse")
+        h.update(getattr(stormpy, "__version__", "unknown").encode())
+        return h.hexdigest()
+
+    def model_file(self, key):
+        return os.path.join(self.directory, key + model_io.FORMATS[self.model_format])
+
+    def info_file(self, key):
+        return os.path.join(self.directory, "{}.json".format(key))
+
+    def load(self, key):
+        """
+        Load model from cache.
+        :param key: Cache key.
+        :return: Model or None if the model is not cached.
+        """
+        model_file = self.model_file(key)
+        if not os.path.exists(model_file):
+            self.hit = False
+            self.time_saved = 0
+            logging.info("Model cache miss for key {}".format(key))
+            return None
+        start_load = time.time()
+        try:
+            model = model_io.load_model(model_file, self.model_format)
+        except ValueError as e:
+            # Entries written in an outdated format are rebuilt
+            logging.warning("Ignoring invalid model cache entry {}: {}".format(key, e))
+            os.remove(model_file)
+            self.hit = False
+            self.time_saved = 0
+            return None
+        time_load = time.time() - start_load
+        # Mark entry as recently used
+        os.utime(model_file)
+        time_original = 0
+        if os.path.exists(self.info_file(key)):
+            with open(self.info_file(key), 'r') as f:
+                info = json.load(f)
+            time_original = info["time_build"] + info["time_bisimulation"]
+        self.hit = True
+        self.time_saved = max(time_original - time_load, 0)
+        logging.info("Model cache hit for key {}: loading took {}s, saved {}s".format(key, time_load, self.time_saved))
+        return model
+
+    def store(self, key, model, time_build, time_bisim):
+        """
+        Store model in cache and evict old entries if the cache exceeds its size limit.
+        :param key: Cache key.
+        :param model: Model.
+        :param time_build: Time (s) needed for building the model.
+        :param time_bisim: Time (s) needed for bisimulation.
+        """
+        # Write to temporary file first to avoid corrupted entries from concurrent runs
+        fd, tmp_file = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        os.close(fd)
+        tmp_info_file = None
+        try:
+            model_io.export_model(model, tmp_file, self.model_format)
+            # The info file is only created once the export succeeded
+            fd, tmp_info_file = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"time_build": time_build, "time_bisimulation": time_bisim, "states": model.nr_states, "transitions": model.nr_transitions}, f)
+            os.replace(tmp_info_file, self.info_file(key))
+            os.replace(tmp_file, self.model_file(key))
+        finally:
+            for file in [tmp_file, tmp_info_file]:
+                if file is not None and os.path.exists(file):
+                    os.remove(file)
+        logging.debug("Stored model with key {} in cache".format(key))
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Evict least recently used entries until the cache size is below the limit.
+        :param keep: Key of entry which should not be evicted.
+        """
+        if self.max_size is None:
+            return
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.directory):
+            key, ext = os.path.splitext(name)
+            if ext not in model_io.FORMATS.values():
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            total_size += stat.st_size
+            if key != keep:
+                entries.append((stat.st_mtime, stat.st_size, key, path))
+
+        limit = self.max_size * 1024 * 1024
+        for _, size, key, path in sorted(entries):
+            if total_size <= limit:
+                break
+            logging.debug("Evict model with key {} from cache".format(key))
+            os.remove(path)
+            if os.path.exists(self.info_file(key)):
+                os.remove(self.info_file(key))
+            total_size -= size
+
+
+class RootCache:
+    """
+    Persistent cache of the roots of normalized polynomials.
+    Derivatives of transition probabilities are often shared between models of the same family.
+    """
+
+    def __init__(self, file):
+        """
+        Constructor.
+        :param file: JSON file containing the cached roots. It is created on the first store.
+        """
+        self.file = file
+        self.roots = self.read()
+
+    def read(self):
+        if not os.path.exists(self.file):
+            return dict()
+        try:
+            with open(self.file, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            logging.warning("Ignoring corrupted root cache {}".format(self.file))
+            return dict()
+
+    @staticmethod
+    def compute_key(polynomial):
+        return " ".join(str(coeff) for coeff in polynomial)
+
+    def lookup(self, polynomial):
+        """
+        Get cached roots.
+        :param polynomial: Normalized polynomial.
+        :return: Roots or None if the polynomial is not cached.
+        """
+        return self.roots.get(self.compute_key(polynomial))
+
+    def store(self, new_roots):
+        """
+        Store roots in cache.
+        :param new_roots: Dictionary from normalized polynomials to their roots.
+        """
+        if not new_roots:
+            return
+        # Merge with entries written by concurrent runs in the meantime
+        self.roots.update(self.read())
+        for polynomial, roots in new_roots.items():
+            self.roots[self.compute_key(polynomial)] = roots
+        directory = os.path.dirname(self.file)
+        fd, tmp_file = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.roots, f)
+            os.replace(tmp_file, self.file)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        logging.debug("Stored roots of {} polynomials in cache".format(len(new_roots)))
+
+
+def get_model_cache(config):
+    """
+    Get model cache for configuration.
+    :param config: Configuration.
+    :return: Model cache or None if caching is disabled.
+    """
+    if config.cache_dir is None:
+        return None
+    return ModelCache(config.cache_dir, config.cache_size, config.model_format)
+
+
+def get_root_cache(config):
+    """
+    Get root cache for configuration.
+    :param config: Configuration.
+    :return: Root cache or None if caching is disabled.
+    """
+    if config.cache_dir is None:
+        return None
+    os.makedirs(config.cache_dir, exist_ok=True)
+    return RootCache(os.path.join(config.cache_dir, "roots.json"))
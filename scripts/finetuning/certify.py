@@ -0,0 +1,109 @@
+import logging
+import time
+
+import stormpy
+
+import finetuning.pla_helper as pla_helper
+
+
+class Certifier:
+    """
+    Certification of the result of a PLA run in floating point arithmetic.
+    Only the upper bound is computed exactly: it is the value of the best sample obtained by the exact instantiation checker.
+    Regions collapsed to a single point by the monotonicity check are resolved by the exact instantiation checker as well.
+    PLA itself has no exact counterpart. The lower bound is the minimum of the sound PLA bounds of the remaining regions and the final upper bound
+    of the floating point run. The latter is a lower bound for all discarded regions as regions are only discarded if their sound PLA bound exceeds
+    the current upper bound, which never increases. The bounds of the remaining regions are taken from the floating point run and are not recomputed.
+    All floating point bounds are converted exactly into rational numbers, thus the certificate is as reliable as the sound PLA bounds.
+    If the certified bounds are not precise enough, the remaining regions preventing the precision are refined with exact sampling and sound PLA.
+    """
+
+    def __init__(self, model, parameters, env, max_rounds=10):
+        """
+        Constructor.
+        :param model: Model.
+        :param parameters: Parameters.
+        :param env: Environment which must yield sound results.
+        :param max_rounds: Maximal number of rounds of local refinement.
+        """
+        self.model = model
+        self.parameters = parameters
+        self.env = env
+        self.max_rounds = max_rounds
+        self.initial_state = model.initial_states[0]
+        # The PLA solver is only needed for the local refinement
+        self.solver = None
+        properties = stormpy.parse_properties("R=? [F \"stable\"]")
+        assert len(properties) == 1
+        self.inst_checker = pla_helper.init_instantiation_checker(model, properties[0], True)
+        self.no_calls = 0
+        self.no_refinements = 0
+        self.time = 0
+
+    def sample(self, point):
+        return stormpy.Rational(self.inst_checker.check(self.env, point.carl_valuation(self.parameters)).at(self.initial_state))
+
+    def lower_bound(self, region):
+        if self.solver is None:
+            self.solver = pla_helper.init_solver(None, self.model, self.env)
+        self.no_calls += 1
+        return pla_helper.convert_number(pla_helper.get_bound_region(region, self.solver, self.env, self.parameters, False), True)
+
+    def certify(self, regions, region_bounds, point_regions, upper_bound, best_sample, precision, split_strategy="all"):
+        """
+        Certify result of floating point PLA.
+        :param regions: Remaining regions.
+        :param region_bounds: Sound lower bounds of the remaining regions computed by the floating point run.
+        :param point_regions: Regions collapsed to a single point, which the floating point run resolved by a floating point instantiation.
+        :param upper_bound: Final upper bound of the floating point run.
+        :param best_sample: Sample corresponding to upper bound.
+        :param precision: Exact precision.
+        :param split_strategy: Strategy for splitting regions in the local refinement.
+        :return: Tuple (remaining regions, exact lower bound, exact upper bound, best sample, whether the precision is certified).
+        """
+        start_certification = time.time()
+        exact_upper = self.sample(best_sample)
+        # Point regions are not covered by sound PLA bounds and are evaluated exactly.
+        # Their exact value is at least the exact upper bound and thus never decreases the lower bound.
+        for region in point_regions:
+            point = region.middle()
+            sample = self.sample(point)
+            if sample < exact_upper:
+                exact_upper = sample
+                best_sample = point
+        # All discarded regions (except point regions) have a larger sound lower bound than the final upper bound
+        discarded_bound = stormpy.Rational(upper_bound)
+        bounds = [(pla_helper.convert_number(bound, True), region) for bound, region in zip(region_bounds, regions)]
+        certified = False
+        for iteration in range(self.max_rounds + 1):
+            bounds = [(bound, region) for bound, region in bounds if bound <= exact_upper]
+            lower_bound = min([discarded_bound] + [bound for bound, _ in bounds])
+            logging.info("Certification round {}: bounds: [{}, {}], {} regions remaining".format(iteration, float(lower_bound), float(exact_upper), len(bounds)))
+            if exact_upper - lower_bound <= precision:
+                certified = True
+                break
+            if exact_upper - discarded_bound > precision or iteration == self.max_rounds:
+                # Discarded regions cannot be refined anymore
+                break
+            # Refine all regions which prevent the precision and sample their sub-regions exactly
+            new_bounds = []
+            for bound, region in bounds:
+                if exact_upper - bound <= precision:
+                    new_bounds.append((bound, region))
+                    continue
+                self.no_refinements += 1
+                for new_region in region.split(self.parameters, split_strategy):
+                    point = new_region.middle()
+                    sample = self.sample(point)
+                    if sample < exact_upper:
+                        exact_upper = sample
+                        best_sample = point
+                    new_bounds.append((self.lower_bound(new_region), new_region))
+            bounds = new_bounds
+
+        self.time = time.time() - start_certification
+        if certified:
+            logging.info("Certified bounds [{}, {}] in {:.3f}s".format(lower_bound, exact_upper, self.time))
+        else:
+            logging.warning("Could not certify precision {}: certified bounds are [{}, {}]".format(float(precision), lower_bound, exact_upper))
+        return [region for _, region in bounds], lower_bound, exact_upper, best_sample, certified
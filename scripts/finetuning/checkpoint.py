@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+import finetuning.pla_helper as pla_helper
+from finetuning.region import Point, Region
+
+
+class Checkpoint:
+    """
+    Periodic checkpoint of the PLA refinement which allows to resume interrupted runs.
+    A checkpoint contains the regions which still have to be checked, the bounds, the best sample and the statistics.
+    """
+
+    def __init__(self, file, key, interval):
+        """
+        Constructor.
+        :param file: Checkpoint file.
+        :param key: Key identifying the model and the configuration.
+        :param interval: Minimal time (s) between two checkpoints.
+        """
+        self.file = file
+        self.key = key
+        self.interval = interval
+        self.last_save = time.time()
+
+    @staticmethod
+    def compute_key(model_file, config):
+        """
+        Compute key for checkpoint. Checkpoints can only be resumed for the same model file and configuration.
+        :param model_file: Model file.
+        :param config: Configuration.
+        :return: Hash key.
+        """
+        h = hashlib.sha256()
+        with open(model_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        h.update("{}, exact {}, certify {}, eps {}, split strategy {}, monotonicity {}".format(config, config.exact, config.certify, config.eps,
+                                                                                             config.split_strategy, config.monotonicity).encode())
+        return h.hexdigest()
+
+    def due(self):
+        """
+        Check whether the next checkpoint should be written.
+        :return: True iff the last checkpoint is older than the interval.
+        """
+        return time.time() - self.last_save >= self.interval
+
+    def save(self, variable_names, regions, lower_bound, upper_bound, best_sample, no_calls, no_splits, exact, point_regions=()):
+        """
+        Write checkpoint atomically.
+        :param variable_names: Ordered variable names.
+        :param regions: Regions which still have to be checked.
+        :param lower_bound: Current lower bound.
+        :param upper_bound: Current upper bound.
+        :param best_sample: Sample corresponding to upper bound.
+        :param no_calls: Number of PLA calls so far.
+        :param no_splits: Number of splits so far.
+        :param exact: Whether bounds are exact rational numbers.
+        :param point_regions: Regions collapsed to a single point (needed for the certification).
+        """
+        start_save = time.time()
+        # Exact numbers are stored as strings
+        data = {
+            "key": self.key,
+            "variables": variable_names,
+            "regions": [region.encode(variable_names) for region in regions],
+            "lower_bound": str(lower_bound) if exact else lower_bound,
+            "upper_bound": str(upper_bound) if exact else upper_bound,
+            "best_sample": None if best_sample is None else best_sample.encode(variable_names),
+            "no_calls": no_calls,
+            "no_splits": no_splits,
+            "point_regions": [region.encode(variable_names) for region in point_regions],
+        }
+        directory = os.path.dirname(os.path.abspath(self.file))
+        fd, tmp_file = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, self.file)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        self.last_save = time.time()
+        logging.info("Saved checkpoint with {} regions to {} in {:.3f}s".format(len(regions), self.file, self.last_save - start_save))
+
+    def load(self, exact):
+        """
+        Load checkpoint.
+        :param exact: Whether bounds are exact rational numbers.
+        :return: Tuple (regions, lower bound, upper bound, best sample, number of calls, number of splits, regions collapsed to a single point).
+        """
+        with open(self.file, 'rb') as f:
+            data = pickle.load(f)
+        if data["key"] != self.key:
+            raise ValueError("Checkpoint '{}' was created for a different model or configuration".format(self.file))
+        names = data["variables"]
+        regions = [Region.decode(encoded, names) for encoded in data["regions"]]
+        best_sample = None if data["best_sample"] is None else Point.decode(data["best_sample"], names)
+        logging.info("Resuming from checkpoint {} with {} regions".format(self.file, len(regions)))
+        return (regions, pla_helper.convert_number(data["lower_bound"], exact), pla_helper.convert_number(data["upper_bound"], exact), best_sample,
+                data["no_calls"], data["no_splits"], [Region.decode(encoded, names) for encoded in data.get("point_regions", [])])
+
+    def remove(self):
+        if os.path.exists(self.file):
+            os.remove(self.file)
+
+
+def get_checkpoint(model_file, config):
+    """
+    Get checkpoint for configuration.
+    :param model_file: Model file.
+    :param config: Configuration.
+    :return: Checkpoint or None if checkpointing is disabled.
+    """
+    if config.checkpoint_file is None:
+        return None
+    return Checkpoint(config.checkpoint_file, Checkpoint.compute_key(model_file, config), config.checkpoint_interval)
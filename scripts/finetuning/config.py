@@ -1,3 +1,4 @@
+import multiprocessing
 import re
 import stormpy
 
@@ -17,6 +18,25 @@ class Config:
         self.old_algorithm = old_algorithm
         self.eps = 1e-10
         self.linear_equation_solver = None  # Use default (i.e. stormpy.EquationSolverType.topological)
+        self.cache_dir = None  # Directory of model cache (None disables caching)
+        self.cache_size = None  # Maximal size (in MB) of model cache (None for unbounded size)
+        self.simplify = False  # Whether to select the fastest model simplification before PLA
+        # How the model is passed to parallel workers: inherited via fork (if available) or exported to a file
+        self.model_sharing = "fork" if "fork" in multiprocessing.get_all_start_methods() else "file"
+        self.model_format = "drn"  # Format for exported models (see model_io.FORMATS)
+        self.asynchronous = False  # Whether parallel PLA processes regions asynchronously instead of level by level
+        self.worker_timeout = 3600  # Maximal time (s) for parallel processes to load the model
+        self.best_first = False  # Whether single-process PLA refines the most promising region first instead of level by level
+        self.split_strategy = "all"  # Strategy for splitting regions (see region.SPLIT_STRATEGIES)
+        self.monotonicity = False  # Whether initial regions are collapsed in parameters in which the expected reward is monotone
+        self.checkpoint_file = None  # File for periodic checkpoints of PLA (None disables checkpointing)
+        self.checkpoint_interval = 60  # Minimal time (s) between two checkpoints
+        self.resume = False  # Whether PLA is resumed from the checkpoint file
+        self.deadline = None  # Time (seconds since the epoch) at which PLA stops with the results so far (None for no deadline)
+        self.warm_start = None  # Result file of a previous run whose remaining regions and best sample are used as starting point
+        self.max_rss = None  # Maximal resident memory (in MB) of all processes before PLA stops with the results so far (None for no limit)
+        self.certify = False  # Whether PLA runs in floating point arithmetic with sound bounds and the final result is certified exactly
+        self.local_search = 0  # Maximal number of evaluations of each local search around the best sample (0 disables the local search)
 
     def hybrid_str(self):
         return "symbolic" if self.hybrid else "sparse"
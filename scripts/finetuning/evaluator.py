@@ -0,0 +1,72 @@
+from fractions import Fraction
+
+import numpy
+
+import finetuning.roots as roots
+
+
+def horner_exact(coefficients, value):
+    """
+    Evaluate polynomial exactly.
+    :param coefficients: Exact coefficients where the i-th entry is the coefficient of x^i.
+    :param value: Value.
+    :return: Exact result.
+    """
+    result = Fraction(0)
+    for coefficient in reversed(coefficients):
+        result = result * value + coefficient
+    return result
+
+
+class RationalFunctionEvaluator:
+    """
+    Compiled evaluator for univariate rational functions.
+    Numerator and denominator are converted once into coefficient arrays which are evaluated for whole arrays of points with Horner's scheme.
+    Points at which the floating point evaluation is unreliable are evaluated exactly.
+    """
+
+    def __init__(self, rat_func, tolerance=1e-8):
+        """
+        Constructor.
+        :param rat_func: Univariate rational function (or polynomial).
+        :param tolerance: Points where the denominator is smaller than this fraction of its largest coefficient are evaluated exactly.
+        """
+        if hasattr(rat_func, "numerator"):
+            self.numerator = roots.polynomial_coefficients(rat_func.numerator)
+            self.denominator = roots.polynomial_coefficients(rat_func.denominator)
+        else:
+            self.numerator = roots.polynomial_coefficients(rat_func)
+            self.denominator = [Fraction(1)]
+        # Scale numerator and denominator by the same factor to avoid overflows in the conversion to floats
+        scale = max(abs(coefficient) for coefficient in self.denominator)
+        # Numpy expects coefficients with the highest degree first
+        self.numerator_float = numpy.array([float(coefficient / scale) for coefficient in reversed(self.numerator)] or [0.0])
+        self.denominator_float = numpy.array([float(coefficient / scale) for coefficient in reversed(self.denominator)])
+        self.tolerance = tolerance
+
+    def evaluate(self, values):
+        """
+        Evaluate the rational function on an array of points.
+        :param values: Array of values.
+        :return: Array of results as floats.
+        """
+        values = numpy.asarray(values, dtype=numpy.float64)
+        numerator = numpy.polyval(self.numerator_float, values)
+        denominator = numpy.polyval(self.denominator_float, values)
+        unstable = numpy.abs(denominator) < self.tolerance
+        if numpy.any(unstable):
+            # Fall back to exact evaluation
+            results = numpy.empty_like(values)
+            results[~unstable] = numerator[~unstable] / denominator[~unstable]
+            results[unstable] = [float(self.evaluate_exact(value)) for value in values[unstable]]
+            return results
+        return numerator / denominator
+
+    def evaluate_exact(self, value):
+        """
+        Evaluate the rational function exactly on a single point.
+        :param value: Value.
+        :return: Exact result.
+        """
+        value = Fraction(value)
+        return horner_exact(self.numerator, value) / horner_exact(self.denominator, value)
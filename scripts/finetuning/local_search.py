@@ -0,0 +1,87 @@
+def clamp(values, lower, upper):
+    return tuple(min(max(value, lower), upper) for value in values)
+
+
+def move(origin, target, factor):
+    """
+    Compute origin + factor * (target - origin).
+    """
+    return tuple(o + factor * (t - o) for o, t in zip(origin, target))
+
+
+def initial_simplex(start, lower, upper, step):
+    """
+    Construct a simplex by moving the start point along each axis.
+    """
+    simplex = [clamp(start, lower, upper)]
+    for i in range(len(start)):
+        vertex = list(simplex[0])
+        vertex[i] = vertex[i] + step if vertex[i] + step <= upper else vertex[i] - step
+        simplex.append(clamp(vertex, lower, upper))
+    return simplex
+
+
+def nelder_mead(function, start, lower, upper, max_evaluations, step=0.05, tolerance=1e-8):
+    """
+    Minimize function by the derivative-free Nelder-Mead method restricted to the box [lower, upper]^d.
+    Only comparisons of function values are needed, thus the function can also return exact numbers.
+    As the simplex can collapse on the boundary of the box, the search is restarted around the best point as long as this improves the result.
+    :param function: Function mapping a tuple of values to the function value.
+    :param start: Start point as tuple of values.
+    :param lower: Lower bound for all values.
+    :param upper: Upper bound for all values.
+    :param max_evaluations: Maximal number of function evaluations (can be exceeded by the last step).
+    :param step: Size of the initial simplex.
+    :param tolerance: The search is restarted or stops if the simplex is smaller than this size.
+    :return: Tuple (minimal function value, corresponding point, number of evaluations).
+    """
+    dimension = len(start)
+    simplex = initial_simplex(start, lower, upper, step)
+    values = [function(vertex) for vertex in simplex]
+    evaluations = len(simplex)
+    restart_value = None
+
+    while evaluations < max_evaluations:
+        order = sorted(range(len(simplex)), key=lambda i: values[i])
+        simplex = [simplex[i] for i in order]
+        values = [values[i] for i in order]
+        best = simplex[0]
+        if max(abs(a - b) for vertex in simplex[1:] for a, b in zip(vertex, best)) < tolerance:
+            if restart_value is not None and not values[0] < restart_value:
+                break
+            restart_value = values[0]
+            simplex = initial_simplex(best, lower, upper, step)
+            values = [values[0]] + [function(vertex) for vertex in simplex[1:]]
+            evaluations += dimension
+            continue
+
+        worst = simplex[-1]
+        centroid = tuple(sum(vertex[i] for vertex in simplex[:-1]) / dimension for i in range(dimension))
+        reflected = clamp(move(centroid, worst, -1), lower, upper)
+        value_reflected = function(reflected)
+        evaluations += 1
+        if value_reflected < values[0]:
+            expanded = clamp(move(centroid, worst, -2), lower, upper)
+            value_expanded = function(expanded)
+            evaluations += 1
+            if value_expanded < value_reflected:
+                simplex[-1], values[-1] = expanded, value_expanded
+            else:
+                simplex[-1], values[-1] = reflected, value_reflected
+        elif value_reflected < values[-2]:
+            simplex[-1], values[-1] = reflected, value_reflected
+        else:
+            contracted = move(centroid, worst, 0.5)
+            value_contracted = function(contracted)
+            evaluations += 1
+            if value_contracted < values[-1]:
+                simplex[-1], values[-1] = contracted, value_contracted
+            else:
+                # Shrink simplex towards best vertex
+                for i in range(1, len(simplex)):
+                    simplex[i] = move(best, simplex[i], 0.5)
+                    values[i] = function(simplex[i])
+                evaluations += len(simplex) - 1
+
+    index = min(range(len(simplex)), key=lambda i: values[i])
+    return values[index], simplex[index], evaluations
@@ -0,0 +1,252 @@
+import contextlib
+import json
+import os
+import tempfile
+import zipfile
+from array import array
+
+import numpy
+import pycarl
+import pycarl.cln as pc
+import stormpy
+
+# File extension for each model format
+FORMATS = {"drn": ".drn", "binary": ".bin", "compressed": ".binz"}
+
+# Version of the binary format
+VERSION = 2
+
+
+def encode_polynomial(polynomial, variable_index):
+    """
+    Encode polynomial as list of terms.
+    :param polynomial: Polynomial.
+    :param variable_index: Dictionary from variable names to indices.
+    :return: List of tuples (coefficient string, list of tuples (variable index, exponent)).
+    """
+    terms = []
+    for term in polynomial:
+        exponents = []
+        if term.monomial is not None:
+            exponents = [(variable_index[var.name], exp) for var, exp in term.monomial.exponents]
+        terms.append((str(term.coeff), exponents))
+    return terms
+
+
+def decode_polynomial(terms, variables):
+    """
+    Decode polynomial from list of terms.
+    :param terms: Encoded terms.
+    :param variables: Variables.
+    :return: Polynomial.
+    """
+    polynomial = pc.Polynomial(pc.Rational(0))
+    for coeff, exponents in terms:
+        term = pc.Polynomial(pc.Rational(coeff))
+        for index, exp in exponents:
+            for _ in range(exp):
+                term *= variables[index]
+        polynomial += term
+    return polynomial
+
+
+class FunctionTable:
+    """
+    Table of distinct rational functions occurring in a model.
+    Models such as Herman contain only few distinct transition probabilities.
+    """
+
+    def __init__(self, variable_names):
+        self.variable_index = {name: i for i, name in enumerate(variable_names)}
+        self.indices = dict()
+        self.functions = []
+
+    def index(self, function):
+        key = str(function)
+        index = self.indices.get(key)
+        if index is None:
+            index = len(self.functions)
+            self.indices[key] = index
+            self.functions.append((encode_polynomial(function.numerator.polynomial(), self.variable_index),
+                                   encode_polynomial(function.denominator.polynomial(), self.variable_index)))
+        return index
+
+
+def get_variable(name):
+    var = pycarl.variable_with_name(name)
+    if var.is_no_variable:
+        var = pycarl.Variable(name)
+    return var
+
+
+def export_binary(model, file, compress=False):
+    """
+    Export parametric DTMC into binary format.
+    The file is a NumPy archive containing integer arrays for the CSR transition structure, the labels and the rewards
+    together with a JSON header for the table of rational functions. It contains no pickled objects.
+    :param model: Parametric DTMC.
+    :param file: File.
+    :param compress: Whether the file should be compressed.
+    """
+    variable_names = sorted(var.name for var in model.collect_all_parameters())
+    table = FunctionTable(variable_names)
+    matrix = model.transition_matrix
+    row_lengths = array('q')
+    columns = array('q')
+    values = array('q')
+    for state in range(model.nr_states):
+        row = matrix.get_row(state)
+        length = 0
+        for entry in row:
+            columns.append(entry.column)
+            values.append(table.index(entry.value()))
+            length += 1
+        row_lengths.append(length)
+
+    arrays = {
+        "row_lengths": numpy.frombuffer(row_lengths, dtype=numpy.int64),
+        "columns": numpy.frombuffer(columns, dtype=numpy.int64),
+        "values": numpy.frombuffer(values, dtype=numpy.int64),
+    }
+    labels = sorted(model.labeling.get_labels())
+    for i, label in enumerate(labels):
+        arrays["label_{}".format(i)] = numpy.array(list(model.labeling.get_states(label)), dtype=numpy.int64)
+    reward_models = []
+    for i, (name, reward_model) in enumerate(sorted(model.reward_models.items())):
+        reward_models.append((name, reward_model.has_state_rewards, reward_model.has_state_action_rewards))
+        if reward_model.has_state_rewards:
+            arrays["state_rewards_{}".format(i)] = numpy.array([table.index(value) for value in reward_model.state_rewards], dtype=numpy.int64)
+        if reward_model.has_state_action_rewards:
+            arrays["state_action_rewards_{}".format(i)] = numpy.array([table.index(value) for value in reward_model.state_action_rewards], dtype=numpy.int64)
+
+    header = {
+        "version": VERSION,
+        "states": model.nr_states,
+        "transitions": model.nr_transitions,
+        "variables": variable_names,
+        "functions": table.functions,
+        "labels": labels,
+        "reward_models": reward_models,
+    }
+    arrays["header"] = numpy.array(json.dumps(header))
+    with open(file, 'wb') as f:
+        # Writing to a file object prevents NumPy from appending the extension .npz
+        if compress:
+            numpy.savez_compressed(f, **arrays)
+        else:
+            numpy.savez(f, **arrays)
+
+
+def load_binary(file):
+    """
+    Load parametric DTMC from binary format.
+    :param file: File.
+    :return: Parametric DTMC.
+    """
+    try:
+        # Pickled objects are rejected such that loading a file cannot execute code
+        with numpy.load(file, allow_pickle=False) as archive:
+            data = {name: archive[name] for name in archive.files}
+        header = json.loads(str(data["header"]))
+    except (ValueError, KeyError, OSError, zipfile.BadZipFile) as e:
+        raise ValueError("File '{}' is not a binary model file: {}".format(file, e))
+    if header.get("version") != VERSION:
+        raise ValueError("File '{}' has an unsupported binary model version".format(file))
+
+    variables = [get_variable(name) for name in header["variables"]]
+    # Factorized polynomials must share the global factorization cache
+    cache = pc.factorization_cache
+    one = pc.FactorizedPolynomial(pc.Rational(1))
+    functions = []
+    for numerator, denominator in header["functions"]:
+        numerator = pc.FactorizedPolynomial(decode_polynomial(numerator, variables), cache)
+        if len(denominator) == 1 and not denominator[0][1] and denominator[0][0] == "1":
+            denominator = one
+        else:
+            denominator = pc.FactorizedPolynomial(decode_polynomial(denominator, variables), cache)
+        functions.append(pc.FactorizedRationalFunction(numerator, denominator))
+
+    # Transition matrix
+    nr_states = header["states"]
+    builder = stormpy.ParametricSparseMatrixBuilder(rows=nr_states, columns=nr_states, entries=header["transitions"], force_dimensions=True)
+    columns = data["columns"].tolist()
+    values = data["values"].tolist()
+    position = 0
+    for state, length in enumerate(data["row_lengths"].tolist()):
+        for i in range(position, position + length):
+            builder.add_next_value(state, columns[i], functions[values[i]])
+        position += length
+    matrix = builder.build()
+
+    # Labeling
+    labeling = stormpy.StateLabeling(nr_states)
+    for i, label in enumerate(header["labels"]):
+        labeling.add_label(label)
+        labeling.set_states(label, stormpy.BitVector(nr_states, data["label_{}".format(i)].tolist()))
+
+    # Rewards
+    reward_models = dict()
+    for i, (name, has_state_rewards, has_state_action_rewards) in enumerate(header["reward_models"]):
+        state_rewards = None
+        if has_state_rewards:
+            state_rewards = [functions[j] for j in data["state_rewards_{}".format(i)].tolist()]
+        state_action_rewards = None
+        if has_state_action_rewards:
+            state_action_rewards = [functions[j] for j in data["state_action_rewards_{}".format(i)].tolist()]
+        reward_models[name] = stormpy.SparseParametricRewardModel(optional_state_reward_vector=state_rewards, optional_state_action_reward_vector=state_action_rewards)
+
+    components = stormpy.SparseParametricModelComponents(transition_matrix=matrix, state_labeling=labeling, reward_models=reward_models)
+    return stormpy.storage.SparseParametricDtmc(components)
+
+
+def export_model(model, file, model_format):
+    """
+    Export parametric model.
+    :param model: Model.
+    :param file: File.
+    :param model_format: Model format (see FORMATS).
+    """
+    if model_format == "drn":
+        stormpy.export_parametric_to_drn(model, file)
+    else:
+        assert model_format in FORMATS
+        export_binary(model, file, compress=model_format == "compressed")
+
+
+def load_model(file, model_format=None):
+    """
+    Load parametric model.
+    :param file: File.
+    :param model_format: Model format (see FORMATS). If None, the format is derived from the file extension.
+    :return: Model.
+    """
+    if model_format is None:
+        model_format = format_from_extension(file)
+    if model_format == "drn":
+        return stormpy.build_parametric_model_from_drn(file)
+    return load_binary(file)
+
+
+def format_from_extension(file):
+    extension = os.path.splitext(file)[1]
+    for model_format, ext in FORMATS.items():
+        if ext == extension:
+            return model_format
+    raise ValueError("Unknown model format for file '{}'".format(file))
+
+
+@contextlib.contextmanager
+def temporary_model_file(model, model_format):
+    """
+    Export model into a temporary file which is removed afterwards (also on errors and interrupts).
+    :param model: Model.
+    :param model_format: Model format (see FORMATS).
+    :return: Context manager yielding the file name.
+    """
+    fd, file = tempfile.mkstemp(suffix=FORMATS[model_format])
+    os.close(fd)
+    try:
+        export_model(model, file, model_format)
+        yield file
+    finally:
+        os.remove(file)
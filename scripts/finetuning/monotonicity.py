@@ -0,0 +1,144 @@
+import logging
+
+import stormpy
+
+from finetuning.region import Interval, Region
+
+INCREASING = 1
+DECREASING = -1
+
+
+def is_supported(solver):
+    """
+    Check whether the PLA solver can compute bounds for all states which are needed for the monotonicity check.
+    :param solver: PLA solver.
+    :return: True iff supported.
+    """
+    return hasattr(solver, "get_bound_all_states")
+
+
+class MonotonicityChecker:
+    """
+    Sufficient check whether the expected reward is monotone in a parameter on a region.
+    The derivative of the expected reward w.r.t. p is the expected reward for the state rewards g(s) = sum_s' dP(s,s')/dp * E(s').
+    Thus, the expected reward is increasing if g(s) >= 0 for all states and all parameter values in the region.
+    As the derivatives of the outgoing transitions sum up to 0, this holds if every successor whose probability increases
+    has a larger expected reward than every successor whose probability decreases.
+    The expected rewards of the successors are bounded by PLA on all states.
+    The derivatives must have a constant sign on the region, which holds for regions obtained by splitting at their roots.
+    Thus, the sign is determined at the middle of the interval. The bounds of the interval are (approximate) roots and unsuitable.
+    """
+
+    def __init__(self, model, parameters, target_label="stable"):
+        """
+        Constructor.
+        :param model: Model.
+        :param parameters: Parameters.
+        :param target_label: Label of the target states. Their expected reward is 0 independent of the parameters.
+        """
+        self.parameters = parameters
+        # Parameter name -> list of tuples (state, list of tuples (successor, derivative))
+        self.derivatives = {p.name: [] for p in parameters}
+        # Cache of signs of derivatives for intervals
+        self.signs = dict()
+        matrix = model.transition_matrix
+        for state in range(model.nr_states):
+            if model.labeling.has_state_label(target_label, state):
+                continue
+            successors = {p.name: [] for p in parameters}
+            for entry in matrix.get_row(state):
+                value = entry.value()
+                names = set(var.name for var in value.gather_variables())
+                for p in parameters:
+                    if p.name in names:
+                        successors[p.name].append((entry.column, value.derive(p)))
+            for p in parameters:
+                if successors[p.name]:
+                    self.derivatives[p.name].append((state, successors[p.name]))
+
+    @staticmethod
+    def sign(derivative, parameter, interval):
+        """
+        Get the sign of a derivative on an interval without roots of the derivative.
+        :param derivative: Derivative.
+        :param parameter: Parameter.
+        :param interval: Interval.
+        :return: 1 or -1 if the derivative is positive or negative, 0 if it is zero.
+        """
+        result = derivative.evaluate({parameter: stormpy.RationalRF(interval.middle())})
+        return 1 if result > 0 else (-1 if result < 0 else 0)
+
+    def successor_signs(self, parameter, interval):
+        """
+        Get the successors with increasing and decreasing probability for all states.
+        :param parameter: Parameter.
+        :param interval: Interval of the parameter.
+        :return: List of tuples (increasing successors, decreasing successors).
+        """
+        key = (parameter.name, interval.lower, interval.upper)
+        if key not in self.signs:
+            states = []
+            for state, successors in self.derivatives[parameter.name]:
+                positive = []
+                negative = []
+                for successor, derivative in successors:
+                    sign = self.sign(derivative, parameter, interval)
+                    if sign > 0:
+                        positive.append(successor)
+                    elif sign < 0:
+                        negative.append(successor)
+                if positive and negative:
+                    states.append((positive, negative))
+            self.signs[key] = states
+        return self.signs[key]
+
+    def check(self, region, solver, env):
+        """
+        Check monotonicity of the expected reward on a region.
+        :param region: Region.
+        :param solver: PLA solver.
+        :param env: Environment.
+        :return: Dictionary from parameter names to INCREASING or DECREASING. Parameters without proven monotonicity are not contained.
+        """
+        storm_region = region.storm_region(self.parameters)
+        lower = [float(value) for value in solver.get_bound_all_states(env, storm_region, False).get_values()]
+        upper = [float(value) for value in solver.get_bound_all_states(env, storm_region, True).get_values()]
+        directions = dict()
+        for p in self.parameters:
+            interval = region.intervals[p.name]
+            if interval.lower == interval.upper:
+                continue
+            states = self.successor_signs(p, interval)
+            increasing = True
+            decreasing = True
+            for positive, negative in states:
+                increasing = increasing and min(lower[s] for s in positive) >= max(upper[s] for s in negative)
+                decreasing = decreasing and min(lower[s] for s in negative) >= max(upper[s] for s in positive)
+                if not increasing and not decreasing:
+                    break
+            if increasing:
+                directions[p.name] = INCREASING
+            elif decreasing:
+                directions[p.name] = DECREASING
+        return directions
+
+
+def collapse(region, directions):
+    """
+    Collapse region to the face containing the minimum. All other points of the region are dominated by this face.
+    :param region: Region.
+    :param directions: Dictionary from parameter names to INCREASING or DECREASING.
+    :return: Collapsed region.
+    """
+    intervals = dict()
+    for name, interval in region.intervals.items():
+        direction = directions.get(name)
+        if direction == INCREASING:
+            intervals[name] = Interval(interval.lower, interval.lower)
+        elif direction == DECREASING:
+            intervals[name] = Interval(interval.upper, interval.upper)
+        else:
+            intervals[name] = interval
+    if directions:
+        logging.debug("Collapsed region {} to {}".format(region, Region(intervals)))
+    return Region(intervals)
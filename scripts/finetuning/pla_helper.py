@@ -1,3 +1,7 @@
+import logging
+import os
+import resource
+
 import stormpy
 import stormpy.pars
 
@@ -51,6 +55,18 @@ def get_bound_region(region, solver, env, vars, maximize):
     return result.constant_part()
 
 
+def convert_number(value, exact):
+    """
+    Convert result of Storm into number type used for comparisons.
+    :param value: Value.
+    :param exact: If true, the value is converted into an exact rational number, otherwise into a float.
+    :return: Converted value.
+    """
+    if exact:
+        return stormpy.Rational(value)
+    return float(value)
+
+
 def init_instantiation_checker(model, property, exact):
     """
     Initialize instantiation checker.
@@ -66,3 +82,63 @@ def init_instantiation_checker(model, property, exact):
     instantiation_checker.specify_formula(stormpy.ParametricCheckTask(property.raw_formula, True))
     instantiation_checker.set_graph_preserving(True)
     return instantiation_checker
+
+
+def get_memory_usage(pid=None):
+    """
+    Get resident memory of a process.
+    :param pid: Process id. If None, the current process is used.
+    :return: Resident memory in MB. For other processes, 0 is returned if the memory cannot be determined (e.g., the process terminated).
+    """
+    statm = "/proc/{}/statm".format(pid if pid is not None else "self")
+    try:
+        with open(statm, 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        if pid is not None:
+            return 0
+    # Fall back to peak memory
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def get_proportional_memory_usage(pid=None):
+    """
+    Get proportional set size (PSS) of a process.
+    Pages shared between processes, e.g., the model pages shared copy-on-write with forked processes, are divided among the sharing processes.
+    Thus, the sum over several processes counts shared pages only once.
+    :param pid: Process id. If None, the current process is used.
+    :return: Proportional memory in MB. Falls back to the resident memory if the PSS is not available.
+    """
+    smaps = "/proc/{}/smaps_rollup".format(pid if pid is not None else "self")
+    try:
+        with open(smaps, 'r') as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return get_memory_usage(pid)
+
+
+def use_seed_sample(seed_sample, parameters):
+    """
+    Check whether a seed sample can be used for the given parameters.
+    :param seed_sample: Seed sample.
+    :param parameters: Parameters.
+    :return: True iff the seed sample assigns exactly the given parameters.
+    """
+    if set(seed_sample.val.keys()) != set(p.name for p in parameters):
+        logging.warning("Ignoring seed sample {} as its parameters do not match".format(seed_sample))
+        return False
+    return True
+
+
+def prioritize_regions(regions, seed_sample):
+    """
+    Order regions such that the regions containing the seed sample come first.
+    :param regions: Regions.
+    :param seed_sample: Seed sample.
+    :return: Ordered regions.
+    """
+    return sorted(regions, key=lambda region: not region.contains(seed_sample))
@@ -2,17 +2,27 @@ import time
 import multiprocessing
 import os
 import logging
-import tempfile
 import itertools
+import contextlib
+import heapq
+import queue
 
 import stormpy
 import stormpy.pars
 
 import finetuning.analyse as analyse
 import finetuning.build as build
+import finetuning.cache as cache
+import finetuning.certify as certify
+import finetuning.checkpoint as checkpoint
+import finetuning.local_search as local_search
+import finetuning.model_io as model_io
+import finetuning.monotonicity as monotonicity
 import finetuning.pla_helper as pla_helper
+import finetuning.simplify as simplify
+from finetuning.budget import Budget
 from finetuning.region import Point, Interval, Region, sort_regions
-from finetuning.result import Result
+from finetuning.result import Result, load_warm_start
 
 SOLVER = None
 INST_CHECKER = None
@@ -23,45 +33,59 @@ MODEL = None
 INITIAL_STATE = None
 VARS = None
 LOAD_TIME = None
-
-
-def get_model(drn_file, solver_type=None):
-    logging.debug("Get DRN model for pid {}".format(os.getpid()))
+SHARED_MODEL = None
+MONOTONICITY_CHECKER = None
+
+
+def init_model(load_model, solver_type, sound, ready_queue):
+    """
+    Initialize worker process and report readiness to the parent process.
+    :param load_model: Function returning the model.
+    :param solver_type: Linear equation solver type (optional).
+    :param sound: Whether PLA bounds must be sound.
+    :param ready_queue: Queue for reporting tuples (pid, load time, memory in MB, error message) to the parent process.
+    """
     global MODEL, VARS, INITIAL_STATE, PROPERTY, ENV, LOAD_TIME
     time_start = time.time()
-    MODEL = stormpy.build_parametric_model_from_drn(drn_file)
-    INITIAL_STATE = MODEL.initial_states[0]
-    VARS = build.get_parameters(MODEL)
-    properties = stormpy.parse_properties("R=? [F \"stable\"]")
-    assert (len(properties) == 1)
-    PROPERTY = properties[0]
-    ENV = stormpy.Environment()
-    if solver_type is not None:
-        ENV.solver_environment.set_linear_equation_solver_type(solver_type)
+    try:
+        MODEL = load_model()
+        INITIAL_STATE = MODEL.initial_states[0]
+        VARS = build.get_parameters(MODEL)
+        properties = stormpy.parse_properties("R=? [F \"stable\"]")
+        assert (len(properties) == 1)
+        PROPERTY = properties[0]
+        ENV = stormpy.Environment()
+        if solver_type is not None:
+            ENV.solver_environment.set_linear_equation_solver_type(solver_type)
+        if sound:
+            ENV.solver_environment.set_force_sound()
+    except Exception as e:
+        ready_queue.put((os.getpid(), None, None, "{}: {}".format(type(e).__name__, e)))
+        raise
     logging.info("Model loaded for pid {}: {} states and {} transitions.".format(os.getpid(), MODEL.nr_states, MODEL.nr_transitions))
     LOAD_TIME = time.time() - time_start
+    ready_queue.put((os.getpid(), LOAD_TIME, pla_helper.get_memory_usage(), None))
 
 
-def get_load_time(i):
-    global LOAD_TIME
-    assert LOAD_TIME is not None
-    return LOAD_TIME, os.getpid()
+def get_model(model_file, solver_type, sound, ready_queue):
+    logging.debug("Load model from file for pid {}".format(os.getpid()))
+    init_model(lambda: model_io.load_model(model_file), solver_type, sound, ready_queue)
 
 
-def gather_roots_parallel():
-    logging.debug("Gather roots for pid {}".format(os.getpid()))
-    global MODEL, VARS
-    assert MODEL is not None
-    assert VARS is not None
-    time_start = time.time()
-    roots = analyse.gather_roots(MODEL, VARS)
-    time_end = time.time()
-    return roots, VARS, time_end - time_start
+def get_shared_model(solver_type, sound, ready_queue):
+    # The model was set by the parent process before forking and is shared copy-on-write
+    logging.debug("Get shared model for pid {}".format(os.getpid()))
+    init_model(get_shared_model_instance, solver_type, sound, ready_queue)
 
 
-def get_bound_region_parallel(region):
-    logging.debug("Check region for region {} and pid {}".format(region, os.getpid()))
-    global SOLVER, VARS, ENV
+def get_shared_model_instance():
+    if SHARED_MODEL is None:
+        raise RuntimeError("No shared model available")
+    return SHARED_MODEL
+
+
+def get_solver():
+    global SOLVER, ENV
     assert ENV is not None
     if SOLVER is None:
         # Init solver
@@ -69,14 +93,37 @@ def get_bound_region_parallel(region):
         global MODEL, PROGRAM
         assert MODEL is not None
         SOLVER = pla_helper.init_solver(None, MODEL, ENV, PROGRAM)
+    return SOLVER
 
-    assert SOLVER is not None
+
+def get_bound_region_parallel(region):
+    logging.debug("Check region for region {} and pid {}".format(region, os.getpid()))
+    global VARS, ENV
+    solver = get_solver()
     assert VARS is not None
     # Check region
-    result = pla_helper.get_bound_region(region, SOLVER, ENV, VARS, False)
+    result = pla_helper.get_bound_region(region, solver, ENV, VARS, False)
     return result, region
 
 
+def collapse_monotone_region_parallel(encoded):
+    """
+    Collapse region to its better face in all parameters in which the expected reward is monotone.
+    :param encoded: Encoded region.
+    :return: Tuple (encoded collapsed region, number of collapsed dimensions) or None if the monotonicity check is not supported.
+    """
+    global MONOTONICITY_CHECKER, MODEL, VARS, ENV
+    solver = get_solver()
+    if not monotonicity.is_supported(solver):
+        return None
+    if MONOTONICITY_CHECKER is None:
+        MONOTONICITY_CHECKER = monotonicity.MonotonicityChecker(MODEL, VARS)
+    names = [var.name for var in VARS]
+    region = Region.decode(encoded, names)
+    directions = MONOTONICITY_CHECKER.check(region, solver, ENV)
+    return monotonicity.collapse(region, directions).encode(names), len(directions)
+
+
 def sample_point_parallel(point, exact):
     logging.debug("Sample point {} for pid {}".format(point, os.getpid()))
     global INST_CHECKER, INITIAL_STATE, VARS, ENV
@@ -95,6 +142,175 @@ def sample_point_parallel(point, exact):
     return result, point
 
 
+def check_region_parallel(region, threshold, exact):
+    # Compute lower bound and directly sample the middle if the region is not discarded by the threshold.
+    # This saves a second round trip to the pool for each surviving region.
+    if region.is_point():
+        # Regions collapsed to a single point are resolved by a single instantiation
+        sample = sample_point_parallel(region.middle(), exact)
+        return sample[0], region, sample
+    result, _ = get_bound_region_parallel(region)
+    sample = None
+    if pla_helper.convert_number(result, exact) <= threshold:
+        sample = sample_point_parallel(region.middle(), exact)
+    return result, region, sample
+
+
+def check_regions_parallel(task):
+    """
+    Check a batch of regions (see check_region_parallel).
+    :param task: Tuple (list of encoded regions, threshold, exact).
+    :return: Tuple (list of tuples (lower bound, encoded region, sample result or None), time (s) for the batch).
+    """
+    encoded_regions, threshold, exact = task
+    time_start = time.time()
+    names = [var.name for var in VARS]
+    results = []
+    for encoded in encoded_regions:
+        result, _, sample = check_region_parallel(Region.decode(encoded, names), threshold, exact)
+        results.append((pla_helper.convert_number(result, exact), encoded, None if sample is None else sample[0]))
+    return results, time.time() - time_start
+
+
+def sample_points_parallel(task):
+    """
+    Sample a batch of points.
+    :param task: Tuple (list of encoded points, exact).
+    :return: List of tuples (sample result, encoded point).
+    """
+    encoded_points, exact = task
+    names = [var.name for var in VARS]
+    return [(sample_point_parallel(Point.decode(encoded, names), exact)[0], encoded) for encoded in encoded_points]
+
+
+def local_search_parallel(task):
+    """
+    Search locally for a better sample (see local_search.nelder_mead).
+    :param task: Tuple (encoded start point, exact, eps, maximal number of evaluations).
+    :return: Tuple (best sample result, encoded best point, number of evaluations).
+    """
+    encoded_start, exact, eps, max_evaluations = task
+    names = [var.name for var in VARS]
+    return local_search.nelder_mead(lambda values: sample_point_parallel(Point.decode(values, names), exact)[0], encoded_start, eps, 1 - eps,
+                                    max_evaluations)
+
+
+class BatchSizer:
+    """
+    Determine the number of regions per task from the measured time per region.
+    Tasks should take long enough to amortize the communication overhead but still allow for load balancing.
+    """
+
+    def __init__(self, processes, target_time=0.05):
+        """
+        Constructor.
+        :param processes: Number of processes.
+        :param target_time: Desired time (s) per task.
+        """
+        self.processes = processes
+        self.target_time = target_time
+        self.time_per_region = None
+
+    def update(self, no_regions, duration):
+        if no_regions == 0:
+            return
+        measured = duration / no_regions
+        if self.time_per_region is None:
+            self.time_per_region = measured
+        else:
+            # Exponential moving average
+            self.time_per_region = 0.8 * self.time_per_region + 0.2 * measured
+
+    def size(self, no_regions):
+        """
+        Get batch size.
+        :param no_regions: Number of regions to distribute.
+        :return: Number of regions per task.
+        """
+        if self.time_per_region is None:
+            return 1
+        size = int(self.target_time / max(self.time_per_region, 1e-6))
+        # Keep enough tasks per process for load balancing
+        return max(1, min(size, no_regions // (4 * self.processes)))
+
+
+def batches(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def wait_for_workers(ready_queue, pool, processes, timeout, poll_interval=0.1):
+    """
+    Wait until all worker processes have loaded the model.
+    Fails immediately if a process reports an error or terminates before it is ready.
+    :param ready_queue: Queue on which the workers report their readiness.
+    :param pool: Process pool.
+    :param processes: Number of worker processes.
+    :param timeout: Maximal time (s) to wait.
+    :param poll_interval: Time (s) between two checks of the worker processes.
+    :return: Dictionary from process ids to load times (s).
+    """
+    deadline = time.time() + timeout
+    load_times = dict()
+    # All processes started by the pool. The pool silently replaces processes which terminated,
+    # e.g., due to the OOM killer or a crash in the model loader, thus terminated processes are kept here.
+    workers = dict()
+    while len(load_times) < processes:
+        for process in pool._pool:
+            workers.setdefault(process.pid, process)
+        try:
+            pid, time_load, memory, error = ready_queue.get(timeout=max(min(deadline - time.time(), poll_interval), 0))
+        except queue.Empty:
+            # Errors reported by a process are sent before it terminates and are thus handled first
+            for pid, process in workers.items():
+                if process.exitcode is not None:
+                    reason = "killed by signal {}".format(-process.exitcode) if process.exitcode < 0 else "exit code {}".format(process.exitcode)
+                    raise RuntimeError("Process {} terminated ({}) before loading the model".format(pid, reason))
+            if len(workers) > processes:
+                raise RuntimeError("{} processes were started for a pool of {} processes, some processes terminated while loading the model".format(
+                    len(workers), processes))
+            if time.time() >= deadline:
+                raise RuntimeError("Only {} of {} processes loaded the model within {}s".format(len(load_times), processes, timeout))
+            continue
+        if error is not None:
+            raise RuntimeError("Process {} failed to load the model: {}".format(pid, error))
+        load_times[pid] = time_load
+        logging.info("Process {} ready: loading took {}s, memory {:.0f} MB".format(pid, time_load, memory))
+    return load_times
+
+
+@contextlib.contextmanager
+def worker_pool(model, config):
+    """
+    Start a pool of worker processes which all have loaded the model.
+    The pool is terminated and temporary files are removed when leaving the context, also on errors and interrupts.
+    :param model: Model.
+    :param config: Configuration.
+    :return: Context manager yielding tuple (pool, time (s) for exporting the model, dictionary from process ids to load times (s)).
+    """
+    with contextlib.ExitStack() as stack:
+        if config.model_sharing == "fork":
+            # Workers inherit the model from this process via fork
+            global SHARED_MODEL
+            SHARED_MODEL = model
+            context = multiprocessing.get_context("fork")
+            ready_queue = context.Queue()
+            initializer, initargs = get_shared_model, (config.linear_equation_solver, config.certify, ready_queue)
+            time_export = 0
+        else:
+            # Export model into temporary file. Each process can then load the model from the file.
+            start_export = time.time()
+            model_file_tmp = stack.enter_context(model_io.temporary_model_file(model, config.model_format))
+            time_export = time.time() - start_export
+            context = multiprocessing.get_context()
+            ready_queue = context.Queue()
+            initializer, initargs = get_model, (model_file_tmp, config.linear_equation_solver, config.certify, ready_queue)
+
+        pool = stack.enter_context(context.Pool(config.processes, initializer=initializer, initargs=initargs))
+        # Wait until each process has loaded the model
+        load_times = wait_for_workers(ready_queue, pool, config.processes, config.worker_timeout)
+        yield pool, time_export, load_times
+
+
 class PLAParallel:
     def __init__(self, config):
         self.verbose = False
@@ -102,6 +318,66 @@ class PLAParallel:
         self.no_calls = 0
         self.pool = None
         self.config = config
+        self.variable_names = None
+        self.batch_sizer = BatchSizer(config.processes)
+        self.checkpoint = None
+        self.budget = Budget(config.deadline, config.max_rss)
+        self.incomplete = None  # Reason if the refinement stopped before reaching the precision
+        self.point_regions = []  # Initial regions collapsed to a single point
+        self.no_local_evaluations = 0
+        self.no_local_improvements = 0
+
+    def save_checkpoint(self, regions, lower_bound, upper_bound, best_sample, no_splits, force=False):
+        """
+        Write checkpoint if checkpointing is enabled and the last checkpoint is old enough.
+        :param regions: Regions which still have to be checked.
+        :param lower_bound: Current lower bound.
+        :param upper_bound: Current upper bound.
+        :param best_sample: Sample corresponding to upper bound.
+        :param no_splits: Number of splits including the splits needed for obtaining the given regions.
+        :param force: Whether the checkpoint is written regardless of the time of the last checkpoint.
+        """
+        if self.checkpoint is not None and (force or self.checkpoint.due()):
+            self.checkpoint.save(self.variable_names, regions, lower_bound, upper_bound, best_sample, self.no_calls, no_splits, self.config.exact,
+                                 self.point_regions)
+
+    def local_search_task(self, best_sample):
+        return best_sample.encode(self.variable_names), self.config.exact, self.config.eps, self.config.local_search
+
+    def update_from_local_search(self, local_result, upper_bound, best_sample):
+        """
+        Update the upper bound with the result of a local search.
+        :param local_result: Result of local_search_parallel.
+        :param upper_bound: Current upper bound.
+        :param best_sample: Sample corresponding to upper bound.
+        :return: Tuple (upper bound, best sample).
+        """
+        value, values, evaluations = local_result
+        self.no_local_evaluations += evaluations
+        if value < upper_bound:
+            self.no_local_improvements += 1
+            best_sample = Point.decode(values, self.variable_names)
+            logging.debug("Local search improved upper bound from {} to {} for sample {}".format(upper_bound, value, best_sample))
+            upper_bound = value
+        return upper_bound, best_sample
+
+    def collapse_monotone_regions(self, pool, regions):
+        """
+        Collapse regions to their better face in all parameters in which the expected reward is monotone.
+        The monotonicity is inherited by all sub-regions.
+        :param pool: Process pool.
+        :param regions: Regions.
+        :return: Collapsed regions.
+        """
+        start_monotonicity = time.time()
+        results = pool.map(collapse_monotone_region_parallel, [region.encode(self.variable_names) for region in regions])
+        if any(result is None for result in results):
+            logging.warning("Monotonicity check is not supported by this version of stormpy")
+            return regions
+        self.no_calls += 2 * len(regions)
+        logging.info("Monotonicity check collapsed {} of {} dimensions in {:.3f}s".format(sum(no_collapsed for _, no_collapsed in results),
+                                                                                         len(regions) * len(self.variable_names), time.time() - start_monotonicity))
+        return [Region.decode(encoded, self.variable_names) for encoded, _ in results]
 
     def sample_points(self, pool, parameters, no_samples):
         # Compute samples and pick smallest one as threshold
@@ -120,8 +396,12 @@ class PLAParallel:
 
         threshold = None
         best_point = None
-        it = pool.starmap(sample_point_parallel, [(p, self.config.exact) for p in sample_points])
-        for result, point in it:
+        names = [p.name for p in parameters]
+        batch_size = max(1, len(sample_points) // (4 * self.config.processes))
+        tasks = [(batch, self.config.exact) for batch in batches([point.encode(names) for point in sample_points], batch_size)]
+        it = itertools.chain.from_iterable(pool.imap_unordered(sample_points_parallel, tasks))
+        for result, encoded in it:
+            point = Point.decode(encoded, names)
             logging.debug("Result for point {}: {}".format(point, result))
             assert result > 0
             if threshold is None:
@@ -134,108 +414,359 @@ class PLAParallel:
 
     def compute_satisfying_regions(self, pool, threshold, regions):
         # Compute all regions completely satisfying the threshold
+        # The budget is checked after each batch. If it is exhausted, the regions without result are returned unchecked
+        # and the remaining tasks are dropped when the pool terminates.
         sample_regions = []
+        region_bounds = []
+        unchecked = []
         logging.debug("Compute satisfying regions for threshold {}".format(threshold))
         lower_bound = None
         upper_bound = threshold
 
-        self.no_calls += len(regions)
         if self.verbose:
             logging.debug("Regions: {}".format(", ".join(str(region) for region in regions)))
 
-        it = pool.starmap(get_bound_region_parallel, [(region,) for region in regions])
-
-        for result, region in it:
-            if self.config.exact:
-                result = stormpy.Rational(result)
-            else:
-                result = float(result)
-            logging.debug("Result for {}: {}".format(region, result))
-
-            if result > threshold:
-                # Discard region
-                pass
-            else:
-                assert result <= threshold
-                # Keep region
-                sample_regions.append(region)
+        # Compute lower bounds and samples for surviving regions in batches of regions
+        # Results are processed in the order they arrive
+        names = self.variable_names
+        tasks = [(batch, threshold, self.config.exact) for batch in batches([region.encode(names) for region in regions], self.batch_sizer.size(len(regions)))]
+        best_sample = None
+        checked = set()
+        for results, duration in pool.imap_unordered(check_regions_parallel, tasks):
+            self.batch_sizer.update(len(results), duration)
+            for result, encoded, sample_result in results:
+                checked.add(encoded)
+                region = Region.decode(encoded, names)
+                logging.debug("Result for {}: {}".format(region, result))
+                if not region.is_point():
+                    self.no_calls += 1
+
+                if result > threshold:
+                    # Discard region
+                    continue
+
+                if not region.is_point():
+                    # Keep region, point regions are already resolved by their sample
+                    sample_regions.append(region)
+                    region_bounds.append(result)
                 if lower_bound is None or result < lower_bound:
                     # New lower bound
                     lower_bound = result
 
-        # Sample remaining regions to possibly obtain better upper bound
-        best_sample = None
-        it = pool.starmap(sample_point_parallel, [(region.middle(), self.config.exact) for region in sample_regions])
-        for result, point in it:
-            logging.debug("Result for point {}: {}".format(point, result))
-            if result < upper_bound:
-                # Sample is new upper bound
-                upper_bound = result
-                best_sample = point
-
-        return sample_regions, best_sample, lower_bound, upper_bound
+                if sample_result is not None:
+                    # Sample of remaining region might give better upper bound
+                    point = region.middle()
+                    logging.debug("Result for point {}: {}".format(point, sample_result))
+                    if sample_result < upper_bound:
+                        # Sample is new upper bound
+                        upper_bound = sample_result
+                        best_sample = point
+
+            if len(checked) < len(regions):
+                self.incomplete = self.budget.exhausted()
+                if self.incomplete is not None:
+                    unchecked = [region for region in regions if region.encode(names) not in checked]
+                    break
+
+        if lower_bound is None:
+            # All regions were resolved or discarded
+            lower_bound = upper_bound
+        return sample_regions, region_bounds, unchecked, best_sample, lower_bound, upper_bound
+
+    def refine_synchronous(self, pool, initial_regions, parameters, upper_bound, best_sample, precision):
+        """
+        Refine regions level by level until the bounds are precise enough.
+        :param pool: Process pool.
+        :param initial_regions: Initial regions.
+        :param parameters: Parameters.
+        :param upper_bound: Initial upper bound.
+        :param best_sample: Sample corresponding to upper bound.
+        :param precision: Precision.
+        :return: Tuple (remaining regions, lower bound, upper bound, best sample, lower bounds of the remaining regions).
+        """
+        # Find optimum by iterating the following:
+        # - use PLA (minimize) to obtain lower bounds
+        # - discard all regions whose minimal result is greater than the current upper bound
+        # - sample remaining regions to improve upper bound
+        # - split remaining regions in half
+        start_time_pla = time.time()
+        iteration = 0
+        lower_bound = 0
+        regions = initial_regions
+        region_bounds = [lower_bound] * len(regions)
+        # Local search around the best sample runs in one worker concurrently with the next iteration
+        pending_search = None
+        while upper_bound - lower_bound > precision:
+            iteration += 1
+            if iteration == 1:
+                # Use initial regions
+                new_regions = initial_regions
+            else:
+                # Split regions
+                new_regions = []
+                for region in regions:
+                    # Split region into two
+                    self.no_splits += 1
+                    new_regions.extend(region.split(parameters, self.config.split_strategy))
+
+            previous_lower_bound = lower_bound
+            regions, region_bounds, unchecked, sample, lower_bound, upper_bound = self.compute_satisfying_regions(pool, upper_bound, new_regions)
+            iteration_time = time.time() - start_time_pla
+            start_time_pla = time.time()
+            logging.info("Iteration {}: bounds: [{}, {}], best sample: {}, {} regions remaining, {} calls, {} splits, time: {:.3f}s".format(iteration, lower_bound, upper_bound,
+                                                                                                                                            best_sample, len(regions),
+                                                                                                                                            self.no_calls, self.no_splits,
+                                                                                                                                            iteration_time))
+            if sample is not None:
+                best_sample = sample
+            if pending_search is not None:
+                upper_bound, best_sample = self.update_from_local_search(pending_search.get(), upper_bound, best_sample)
+                pending_search = None
+            if unchecked:
+                # The budget was exhausted during the iteration
+                # The lower bound of the previous iteration is a lower bound for the unchecked regions
+                logging.warning("Stopping refinement early due to {}".format(self.incomplete))
+                lower_bound = min(lower_bound, previous_lower_bound)
+                if self.checkpoint is not None:
+                    # Keep the state to resume the run later
+                    next_regions = [new_region for region in regions for new_region in region.split(parameters, self.config.split_strategy)]
+                    self.save_checkpoint(next_regions + unchecked, lower_bound, upper_bound, best_sample, self.no_splits + len(regions), force=True)
+                region_bounds = region_bounds + [previous_lower_bound] * len(unchecked)
+                regions = regions + unchecked
+                break
+            if sample is not None and self.config.local_search > 0:
+                pending_search = pool.apply_async(local_search_parallel, (self.local_search_task(best_sample),))
+
+            if self.checkpoint is not None and self.checkpoint.due():
+                # Store the sub-regions which are checked in the next iteration
+                next_regions = [new_region for region in regions for new_region in region.split(parameters, self.config.split_strategy)]
+                self.save_checkpoint(next_regions, lower_bound, upper_bound, best_sample, self.no_splits + len(regions))
+
+            if upper_bound - lower_bound > precision:
+                # The next iteration takes at least as long as the current one
+                self.incomplete = self.budget.exhausted(iteration_time)
+                if self.incomplete is not None:
+                    logging.warning("Stopping refinement early due to {}".format(self.incomplete))
+                    if self.checkpoint is not None:
+                        # Keep the state to resume the run later
+                        next_regions = [new_region for region in regions for new_region in region.split(parameters, self.config.split_strategy)]
+                        self.save_checkpoint(next_regions, lower_bound, upper_bound, best_sample, self.no_splits + len(regions), force=True)
+                    break
+
+            if self.verbose:
+                logging.debug("------------")
+                if self.config.exact:
+                    logging.debug("Current bounds: [{}, {}], precision: {}".format(lower_bound, upper_bound, upper_bound - lower_bound))
+                else:
+                    logging.debug("Current bounds: [{}, {}], precision: {:.1e}".format(lower_bound, upper_bound, upper_bound - lower_bound))
+                logging.debug("Best sample: {}".format(best_sample))
+                tmp = sort_regions(list(regions), parameters)
+                for region in tmp:
+                    logging.debug("Region {}".format(region))
+                logging.debug("Time: {:.3f}s".format(time.time() - start_time_pla))
+                logging.debug("------------")
 
-    def find_optimum(self, model_file, verbose=False):
+        return regions, lower_bound, upper_bound, best_sample, region_bounds
+
+    def refine_asynchronous(self, pool, initial_regions, parameters, upper_bound, best_sample, precision):
+        """
+        Refine regions asynchronously until the bounds are precise enough.
+        The frontier of regions is ordered by the lower bound of their parent region.
+        Workers continuously obtain regions from the frontier and each result is processed as soon as it arrives:
+        regions exceeding the current upper bound are discarded and surviving regions are split immediately.
+        The middle of each surviving region is sampled by the worker together with the region check.
+        :param pool: Process pool.
+        :param initial_regions: Initial regions.
+        :param parameters: Parameters.
+        :param upper_bound: Initial upper bound.
+        :param best_sample: Sample corresponding to upper bound.
+        :param precision: Precision.
+        :return: Tuple (remaining regions, lower bound, upper bound, best sample, lower bounds of the remaining regions).
+        """
+        lower_bound = 0
+        # Heap of tuples (lower bound of parent, unique id, region)
+        task_ids = itertools.count()
+        frontier = [(lower_bound, next(task_ids), region) for region in initial_regions]
+        heapq.heapify(frontier)
+        # Batches of regions currently checked by workers: task id -> list of tuples (lower bound of parent, region)
+        in_flight = dict()
+        max_in_flight = 2 * self.config.processes
+        # Results are delivered by the result handler thread of the pool
+        results = queue.Queue()
+
+        # Local search around the best sample runs in one worker whenever the sampling found a better upper bound
+        search_running = False
+
+        def on_error(e):
+            results.put(("error", None, e))
+
+        names = self.variable_names
+        start_time_pla = time.time()
+        last_log = start_time_pla
+        while True:
+            # Dispatch batches of regions to workers
+            while frontier and len(in_flight) < max_in_flight:
+                batch = []
+                batch_size = self.batch_sizer.size(len(frontier))
+                while frontier and len(batch) < batch_size:
+                    bound, _, region = heapq.heappop(frontier)
+                    if bound > upper_bound:
+                        # Discard region as parent is already worse than the current upper bound
+                        continue
+                    batch.append((bound, region))
+                if not batch:
+                    break
+                task_id = next(task_ids)
+                in_flight[task_id] = batch
+                self.no_calls += sum(1 for _, region in batch if not region.is_point())
+                task = ([region.encode(names) for _, region in batch], upper_bound, self.config.exact)
+                pool.apply_async(check_regions_parallel, (task,), callback=lambda r, t=task_id: results.put(("regions", t, r)), error_callback=on_error)
+
+            # The lower bound is the minimal bound of all regions which are not discarded yet
+            bounds = [bound for batch in in_flight.values() for bound, _ in batch]
+            if frontier:
+                bounds.append(frontier[0][0])
+            if not bounds or upper_bound - min(bounds) <= precision:
+                lower_bound = min(bounds) if bounds else upper_bound
+                break
+            self.incomplete = self.budget.exhausted()
+            if self.incomplete is not None:
+                logging.warning("Stopping refinement early due to {}".format(self.incomplete))
+                lower_bound = min(bounds)
+                # Keep the state to resume the run later, regions currently checked by workers are stored as unchecked
+                self.save_checkpoint([region for _, _, region in frontier] + [region for batch in in_flight.values() for _, region in batch], lower_bound,
+                                     upper_bound, best_sample, self.no_splits, force=True)
+                break
+
+            kind, task_id, value = results.get()
+            if kind == "error":
+                raise value
+            if kind == "local":
+                search_running = False
+                upper_bound, best_sample = self.update_from_local_search(value, upper_bound, best_sample)
+                continue
+            assert kind == "regions"
+            batch = in_flight.pop(task_id)
+            batch_results, duration = value
+            self.batch_sizer.update(len(batch_results), duration)
+            improved = False
+            for (_, region), (result, _, sample_result) in zip(batch, batch_results):
+                logging.debug("Result for {}: {}".format(region, result))
+                if sample_result is not None:
+                    logging.debug("Result for point {}: {}".format(region.middle(), sample_result))
+                    if sample_result < upper_bound:
+                        # Sample is new upper bound
+                        upper_bound = sample_result
+                        best_sample = region.middle()
+                        improved = True
+                if result <= upper_bound and not region.is_point():
+                    # Split region and keep its lower bound for the sub-regions
+                    self.no_splits += 1
+                    for new_region in region.split(parameters, self.config.split_strategy):
+                        heapq.heappush(frontier, (result, next(task_ids), new_region))
+            if improved and not search_running and self.config.local_search > 0:
+                search_running = True
+                pool.apply_async(local_search_parallel, (self.local_search_task(best_sample),), callback=lambda r: results.put(("local", None, r)),
+                                 error_callback=on_error)
+
+            if time.time() - last_log > 1:
+                last_log = time.time()
+                logging.info("Progress: bounds: [{}, {}], best sample: {}, {} regions remaining, {} calls, {} splits, time: {:.3f}s".format(
+                    min(bounds), upper_bound, best_sample, len(frontier) + sum(len(batch) for batch in in_flight.values()), self.no_calls, self.no_splits, last_log - start_time_pla))
+                # Regions currently checked by workers are stored as unchecked
+                self.save_checkpoint([region for _, _, region in frontier] + [region for batch in in_flight.values() for _, region in batch], min(bounds),
+                                     upper_bound, best_sample, self.no_splits)
+
+        # Remaining regions are all regions which could not be discarded
+        remaining = [(bound, region) for bound, _, region in frontier if bound <= upper_bound] + [entry for batch in in_flight.values() for entry in batch]
+        regions = [region for _, region in remaining]
+        # Sub-regions are not checked yet, the bound of their parent is a lower bound for them
+        region_bounds = [bound for bound, _ in remaining]
+        lower_bound = min(lower_bound, upper_bound)
+        logging.info("Finished: bounds: [{}, {}], best sample: {}, {} regions remaining, {} calls, {} splits, time: {:.3f}s".format(
+            lower_bound, upper_bound, best_sample, len(regions), self.no_calls, self.no_splits, time.time() - start_time_pla))
+        return regions, lower_bound, upper_bound, best_sample, region_bounds
+
+    def compute_initial_regions(self, roots, parameters):
+        """
+        Create initial regions by splitting the parameter space at the roots.
+        :param roots: Dictionary of all roots for each parameter.
+        :param parameters: Parameters.
+        :return: List of initial regions.
+        """
+        # Create initial intervals per parameter by splitting at roots
+        initial_intervals = dict()
+        for p in parameters:
+            initial_interval = []
+            current = 0 + self.config.eps  # 0 and 1 change graph structure
+            for root in roots[p]:
+                initial_interval.append(Interval(current, root))
+                current = root
+            initial_interval.append(Interval(current, 1 - self.config.eps))
+            initial_intervals[p] = initial_interval
+        # Create initial regions
+        initial_regions = []
+        for product in itertools.product(*initial_intervals.values()):
+            region = {p.name: interval for p, interval in zip(parameters, product)}
+            initial_regions.append(Region(region))
+        return initial_regions
+
+    def find_optimum(self, model_file, verbose=False, seed_sample=None):
+        """
+        Approximate the optimum via parallel PLA.
+        :param model_file: Model file.
+        :param verbose: Whether to log additional information.
+        :param seed_sample: Promising point (e.g., the best sample of a smaller model of the same family) which is checked in addition to the sample points.
+        :return: Result.
+        """
         logging.info("Running PLA in parallel with {} processes".format(self.config.processes))
         self.verbose = verbose
         result = Result(model_file, self.config)
+        self.checkpoint = checkpoint.get_checkpoint(model_file, self.config)
+        resumed = self.checkpoint.load(self.config.exact) if self.config.resume else None
+        warm_start = None
+        if resumed is None and self.config.warm_start is not None:
+            warm_start = load_warm_start(self.config.warm_start, model_file, self.config.eps)
 
         start_time = time.time()
         # Build model in single process
-        model, _, _, time_build, time_bisim = build.build_model(model_file, self.config.hybrid, sylvan_threads=self.config.processes, sylvan_memory=self.config.memory_limit)
+        model_cache = cache.get_model_cache(self.config)
+        model, _, prop, time_build, time_bisim = build.build_model(model_file, self.config.hybrid, sylvan_threads=self.config.processes, sylvan_memory=self.config.memory_limit,
+                                                                   cache=model_cache)
         result.time_build = time_build
         result.time_bisimulation = time_bisim
-
-        # Create temporary file for DRN export
-        start_export = time.time()
-        _, drn_file = tempfile.mkstemp(suffix=".drn")
-        # Export model to DRN format. Each process can then load the simplified model from the file.
-        stormpy.export_parametric_to_drn(model, drn_file)
-        end_export = time.time()
-        result.time_export = end_export - start_export
-        logging.info("Exporting model took {}s".format(result.time_export))
+        if model_cache is not None:
+            result.cache_hit = model_cache.hit
+            result.time_cache_saved = model_cache.time_saved
+        if self.config.simplify:
+            model, result.simplification, result.time_simplification = simplify.simplify_model(model, prop, self.config)
 
         # Start parallelization
-        with multiprocessing.Pool(self.config.processes, initializer=get_model, initargs=(drn_file, self.config.linear_equation_solver)) as pool:
-            # Get loading times by trying to query all processes
-            # As we cannot query each process directly, we start a number of tasks and hope that each process gets a task
-            pids = set()
-            max_time_load = 0
-            no_tasks_time = 1
-            while len(pids) < self.config.processes:
-                logging.debug("Get loading times")
-                it = pool.starmap(get_load_time, [(i,) for i in range(self.config.processes * no_tasks_time)])
-                for time_load, pid in it:
-                    if pid not in pids:
-                        pids.add(pid)
-                        if time_load > max_time_load:
-                            max_time_load = time_load
-                no_tasks_time += 1
-            result.time_load = max_time_load
+        with worker_pool(model, self.config) as (pool, time_export, load_times):
+            result.time_export = time_export
+            logging.info("Exporting model took {}s".format(result.time_export))
+            # The memory of the workers is part of the memory budget
+            self.budget.pids = list(load_times)
+            result.time_load = max(load_times.values())
             logging.info("Loading model took {}s".format(result.time_load))
 
             # Get initial regions by computing the roots
-            results = pool.apply_async(gather_roots_parallel, )
-            roots, parameters, time_roots = results.get()
-            result.time_roots = time_roots
+            # Each derivative is solved by a separate task to use all processes
+            start_roots = time.time()
+            parameters = build.get_parameters(model)
+            self.variable_names = [p.name for p in parameters]
+            if resumed is not None:
+                initial_regions, _, upper_bound, best_sample, self.no_calls, self.no_splits, self.point_regions = resumed
+                result.resumed_regions = len(initial_regions)
+            elif warm_start is not None:
+                initial_regions, best_sample = warm_start
+                result.warm_start_regions = len(initial_regions)
+            else:
+                roots = analyse.gather_roots(model, parameters, cache.get_root_cache(self.config), pool.imap_unordered)
+                initial_regions = self.compute_initial_regions(roots, parameters)
+            result.time_roots = time.time() - start_roots
             logging.info("Computing roots took {}s".format(result.time_roots))
 
-            # Create initial intervals per parameter by splitting at roots
-            initial_intervals = dict()
-            for p in parameters:
-                initial_interval = []
-                current = 0 + self.config.eps  # 0 and 1 change graph structure
-                for root in roots[p]:
-                    initial_interval.append(Interval(current, root))
-                    current = root
-                initial_interval.append(Interval(current, 1 - self.config.eps))
-                initial_intervals[p] = initial_interval
-            # Create initial regions
-            initial_regions = []
-            for product in itertools.product(*initial_intervals.values()):
-                region = {p.name: interval for p, interval in zip(parameters, product)}
-                initial_regions.append(Region(region))
-
             if verbose:
                 logging.debug("------------")
                 for region in initial_regions:
@@ -245,62 +776,56 @@ class PLAParallel:
             # Find upper bound
             start_pla = time.time()
             logging.info("No. initial regions: {}".format(len(initial_regions)))
-            upper_bound, best_sample = self.sample_points(pool, parameters, self.config.no_samples)
-            logging.info("Found upper bound {} for sample {}".format(upper_bound, best_sample))
-            logging.debug("Time: {:.3f}s".format(time.time() - start_time))
-
-            if not self.config.exact:
-                # Slightly increase upper bound to avoid precision issues
-                upper_bound += 1e-4
-            lower_bound = 0
-
-            # Find optimum by iterating the following:
-            # - use PLA (minimize) to obtain lower bounds
-            # - discard all regions whose minimal result is greater than the current upper bound
-            # - sample remaining regions to improve upper bound
-            # - split remaining regions in half
-            start_time_pla = time.time()
-            start_last_iteration = start_time_pla
-            iteration = 0
+            if resumed is None:
+                if warm_start is not None and best_sample is not None:
+                    # Previous best sample is the initial upper bound
+                    [(upper_bound, _)] = pool.apply(sample_points_parallel, (([best_sample.encode(self.variable_names)], self.config.exact),))
+                else:
+                    upper_bound, best_sample = self.sample_points(pool, parameters, self.config.no_samples)
+                    if seed_sample is not None and pla_helper.use_seed_sample(seed_sample, parameters):
+                        [(seed_result, _)] = pool.apply(sample_points_parallel, (([seed_sample.encode(self.variable_names)], self.config.exact),))
+                        logging.info("Result for seed sample {}: {}".format(seed_sample, seed_result))
+                        if seed_result < upper_bound:
+                            upper_bound = seed_result
+                            best_sample = seed_sample
+                        initial_regions = pla_helper.prioritize_regions(initial_regions, seed_sample)
+                if self.config.local_search > 0 and best_sample is not None:
+                    upper_bound, best_sample = self.update_from_local_search(pool.apply(local_search_parallel, (self.local_search_task(best_sample),)),
+                                                                             upper_bound, best_sample)
+                logging.info("Found upper bound {} for sample {}".format(upper_bound, best_sample))
+                logging.debug("Time: {:.3f}s".format(time.time() - start_time))
+
+                if not self.config.exact and not self.config.certify:
+                    # Slightly increase upper bound to avoid precision issues
+                    upper_bound += 1e-4
+
+            if self.config.monotonicity and resumed is None and warm_start is None:
+                initial_regions = self.collapse_monotone_regions(pool, initial_regions)
+                self.point_regions = [region for region in initial_regions if region.is_point()]
+
             if self.config.exact:
                 precision = stormpy.Rational(self.config.precision)
             else:
                 precision = self.config.precision
-            while upper_bound - lower_bound > precision:
-                iteration += 1
-                if iteration == 1:
-                    # Use initial regions
-                    new_regions = initial_regions
-                else:
-                    # Split regions
-                    new_regions = []
-                    for region in regions:
-                        # Split region into two
-                        self.no_splits += 1
-                        new_regions.extend(region.split(parameters))
-
-                regions, sample, lower_bound, upper_bound = self.compute_satisfying_regions(pool, upper_bound, new_regions)
-                iteration_time = time.time() - start_time_pla
-                start_time_pla = time.time()
-                logging.info("Iteration {}: bounds: [{}, {}], best sample: {}, {} regions remaining, {} calls, {} splits, time: {:.3f}s".format(iteration, lower_bound, upper_bound,
-                                                                                                                                                best_sample, len(regions),
-                                                                                                                                                self.no_calls, self.no_splits,
-                                                                                                                                                iteration_time))
-                if sample is not None:
-                    best_sample = sample
-
-                if verbose:
-                    logging.debug("------------")
-                    if self.config.exact:
-                        logging.debug("Current bounds: [{}, {}], precision: {}".format(lower_bound, upper_bound, upper_bound - lower_bound))
-                    else:
-                        logging.debug("Current bounds: [{}, {}], precision: {:.1e}".format(lower_bound, upper_bound, upper_bound - lower_bound))
-                    logging.debug("Best sample: {}".format(best_sample))
-                    tmp = sort_regions(list(regions), parameters)
-                    for region in tmp:
-                        logging.debug("Region {}".format(region))
-                    logging.debug("Time: {:.3f}s".format(time.time() - start_time_pla))
-                    logging.debug("------------")
+            if self.config.asynchronous:
+                regions, lower_bound, upper_bound, best_sample, region_bounds = self.refine_asynchronous(pool, initial_regions, parameters, upper_bound, best_sample, precision)
+            else:
+                regions, lower_bound, upper_bound, best_sample, region_bounds = self.refine_synchronous(pool, initial_regions, parameters, upper_bound, best_sample, precision)
+
+        if self.config.certify:
+            # Certify result of floating point refinement exactly
+            # Results of interrupted runs are only checked but not refined further
+            env = stormpy.Environment()
+            if self.config.linear_equation_solver is not None:
+                env.solver_environment.set_linear_equation_solver_type(self.config.linear_equation_solver)
+            env.solver_environment.set_force_sound()
+            certifier = certify.Certifier(model, parameters, env, max_rounds=0 if self.incomplete is not None else 10)
+            regions, lower_bound, upper_bound, best_sample, result.certified = certifier.certify(regions, region_bounds, self.point_regions, upper_bound, best_sample,
+                                                                                                stormpy.Rational(self.config.precision),
+                                                                                                self.config.split_strategy)
+            result.certification_calls = certifier.no_calls
+            result.certification_refinements = certifier.no_refinements
+            result.time_certification = certifier.time
 
         logging.info("Remaining regions: {}, best sample: {}, {} calls, {} splits".format(len(regions), best_sample, self.no_calls, self.no_splits))
 
@@ -311,4 +836,13 @@ class PLAParallel:
         result.result_ert = Interval(lower_bound, upper_bound)
         result.best_sample = best_sample
         result.result_region = sort_regions(regions, parameters)
+        result.no_calls = self.no_calls
+        result.no_splits = self.no_splits
+        result.incomplete = self.incomplete
+        if self.config.local_search > 0:
+            result.local_search_evaluations = self.no_local_evaluations
+            result.local_search_improvements = self.no_local_improvements
+        if self.checkpoint is not None and self.incomplete is None:
+            # The analysis is finished and the checkpoint is not needed anymore
+            self.checkpoint.remove()
         return result
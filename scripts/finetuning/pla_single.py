@@ -4,12 +4,19 @@ import itertools
 
 import stormpy
 import stormpy.pars
+from sortedcontainers import SortedKeyList
 
 import finetuning.analyse as analyse
 import finetuning.build as build
+import finetuning.cache as cache
+import finetuning.certify as certify
+import finetuning.checkpoint as checkpoint
+import finetuning.local_search as local_search
+import finetuning.monotonicity as monotonicity
 import finetuning.pla_helper as pla_helper
+from finetuning.budget import Budget
 from finetuning.region import Point, Interval, Region, sort_regions
-from finetuning.result import Result
+from finetuning.result import Result, load_warm_start
 
 
 class PLASingle:
@@ -24,8 +31,17 @@ class PLASingle:
         self.env = stormpy.Environment()
         if config.linear_equation_solver is not None:
             self.env.solver_environment.set_linear_equation_solver_type(config.linear_equation_solver)
+        if config.certify:
+            # PLA bounds must be sound for the certification
+            self.env.solver_environment.set_force_sound()
         self.inst_checker = None
         self.solver = None
+        self.checkpoint = None
+        self.budget = Budget(config.deadline, config.max_rss)
+        self.incomplete = None  # Reason if the refinement stopped before reaching the precision
+        self.point_regions = []  # Initial regions collapsed to a single point
+        self.no_local_evaluations = 0
+        self.no_local_improvements = 0
 
     def sample_points(self, parameters, no_samples):
         # Compute samples and pick smallest one as threshold
@@ -58,17 +74,37 @@ class PLASingle:
 
     def compute_satisfying_regions(self, threshold, regions):
         # Compute all regions completely satisfying the threshold
+        # If the budget is exhausted, the remaining regions are returned unchecked
         sample_regions = []
+        region_bounds = []
+        unchecked = []
         logging.debug("Compute satisfying regions for threshold {}".format(threshold))
         lower_bound = None
         upper_bound = threshold
 
-        self.no_calls += len(regions)
         if self.verbose:
             logging.debug("Regions: {}".format(", ".join(str(region) for region in regions)))
 
-        for region in regions:
+        best_sample = None
+        for index, region in enumerate(regions):
+            self.incomplete = self.budget.exhausted()
+            if self.incomplete is not None:
+                unchecked = regions[index:]
+                break
+            if region.is_point():
+                # Regions collapsed to a single point are resolved by a single instantiation
+                point = region.middle()
+                result = self.inst_checker.check(self.env, point.carl_valuation(self.vars)).at(self.initial_state)
+                logging.debug("Result for point region {}: {}".format(point, result))
+                if result <= threshold and (lower_bound is None or result < lower_bound):
+                    lower_bound = result
+                if result < upper_bound:
+                    upper_bound = result
+                    best_sample = point
+                continue
+
             # Check region
+            self.no_calls += 1
             result = pla_helper.get_bound_region(region, self.solver, self.env, self.vars, False)
             if self.config.exact:
                 result = stormpy.Rational(result)
@@ -83,12 +119,16 @@ class PLASingle:
                 assert result <= threshold
                 # Keep region
                 sample_regions.append(region)
+                region_bounds.append(result)
                 if lower_bound is None or result < lower_bound:
                     # New lower bound
                     lower_bound = result
 
+        if lower_bound is None:
+            # All regions were resolved or discarded
+            lower_bound = upper_bound
+
         # Sample remaining regions to possibly obtain better upper bound
-        best_sample = None
         for region in sample_regions:
             point = region.middle()
             result = self.inst_checker.check(self.env, point.carl_valuation(self.vars)).at(self.initial_state)
@@ -98,60 +138,65 @@ class PLASingle:
                 upper_bound = result
                 best_sample = point
 
-        return sample_regions, best_sample, lower_bound, upper_bound
+        return sample_regions, region_bounds, unchecked, best_sample, lower_bound, upper_bound
 
-    def find_optimum(self, model_file, verbose=False):
-        logging.info("Running PLA on single process")
-        self.verbose = verbose
-        result = Result(model_file, self.config)
+    def improve_upper_bound(self, upper_bound, best_sample):
+        """
+        Try to improve the upper bound by a local search starting from the best sample.
+        :param upper_bound: Current upper bound.
+        :param best_sample: Sample corresponding to upper bound.
+        :return: Tuple (upper bound, best sample).
+        """
+        if self.config.local_search <= 0 or best_sample is None:
+            return upper_bound, best_sample
+        names = [var.name for var in self.vars]
 
-        # Get initial regions by computing the roots
-        time_roots_start = time.time()
-        roots = analyse.gather_roots(self.model, self.vars)
-        result.time_roots = time.time() - time_roots_start
-        logging.info("Computing roots took {}s".format(result.time_roots))
+        def evaluate(values):
+            point = Point.decode(values, names)
+            return self.inst_checker.check(self.env, point.carl_valuation(self.vars)).at(self.initial_state)
 
-        # Create initial intervals per parameter by splitting at roots
-        initial_intervals = dict()
-        for p in self.vars:
-            initial_interval = []
-            current = 0 + self.config.eps  # 0 and 1 change graph structure
-            for root in roots[p]:
-                initial_interval.append(Interval(current, root))
-                current = root
-            initial_interval.append(Interval(current, 1 - self.config.eps))
-            initial_intervals[p] = initial_interval
-        # Create initial regions
-        initial_regions = []
-        for product in itertools.product(*initial_intervals.values()):
-            region = {p.name: interval for p, interval in zip(self.vars, product)}
-            initial_regions.append(Region(region))
+        value, values, evaluations = local_search.nelder_mead(evaluate, best_sample.encode(names), self.config.eps, 1 - self.config.eps,
+                                                              self.config.local_search)
+        self.no_local_evaluations += evaluations
+        if value < upper_bound:
+            self.no_local_improvements += 1
+            best_sample = Point.decode(values, names)
+            logging.debug("Local search improved upper bound from {} to {} for sample {}".format(upper_bound, value, best_sample))
+            upper_bound = value
+        return upper_bound, best_sample
 
-        if verbose:
-            logging.debug("------------")
-            for region in initial_regions:
-                logging.debug("Initial region {}".format(region))
-            logging.debug("------------")
-
-        properties = stormpy.parse_properties("R=? [F \"stable\"]")
-        assert len(properties) == 1
-        property = properties[0]
-        self.inst_checker = pla_helper.init_instantiation_checker(self.model, property, self.config.exact)
-
-        # Find upper bound
-        start_pla = time.time()
-        logging.info("No. initial regions: {}".format(len(initial_regions)))
-        upper_bound, best_sample = self.sample_points(self.vars, self.config.no_samples)
-        logging.info("Found upper bound {} for sample {}".format(upper_bound, best_sample))
-        logging.debug("Time: {:.3f}s".format(time.time() - start_pla))
-
-        if not self.config.exact:
-            # Slightly increase upper bound to avoid precision issues
-            upper_bound += 1e-4
-        lower_bound = 0
-
-        self.solver = pla_helper.init_solver(None, self.model, self.env)
+    def collapse_monotone_regions(self, regions):
+        """
+        Collapse regions to their better face in all parameters in which the expected reward is monotone.
+        The monotonicity is inherited by all sub-regions.
+        :param regions: Regions.
+        :return: Collapsed regions.
+        """
+        if not monotonicity.is_supported(self.solver):
+            logging.warning("Monotonicity check is not supported by this version of stormpy")
+            return regions
+        start_monotonicity = time.time()
+        checker = monotonicity.MonotonicityChecker(self.model, self.vars)
+        collapsed_regions = []
+        no_collapsed = 0
+        for region in regions:
+            directions = checker.check(region, self.solver, self.env)
+            self.no_calls += 2
+            no_collapsed += len(directions)
+            collapsed_regions.append(monotonicity.collapse(region, directions))
+        logging.info("Monotonicity check collapsed {} of {} dimensions in {:.3f}s".format(no_collapsed, len(regions) * len(self.vars),
+                                                                                         time.time() - start_monotonicity))
+        return collapsed_regions
 
+    def refine_synchronous(self, initial_regions, upper_bound, best_sample, precision):
+        """
+        Refine regions level by level until the bounds are precise enough.
+        :param initial_regions: Initial regions.
+        :param upper_bound: Initial upper bound.
+        :param best_sample: Sample corresponding to upper bound.
+        :param precision: Precision.
+        :return: Tuple (remaining regions, lower bound, upper bound, best sample, lower bounds of the remaining regions).
+        """
         # Find optimum by iterating the following:
         # - use PLA (minimize) to obtain lower bounds
         # - discard all regions whose minimal result is greater than the current upper bound
@@ -160,10 +205,8 @@ class PLASingle:
         start_time_pla = time.time()
         regions = initial_regions
         iteration = 0
-        if self.config.exact:
-            precision = stormpy.Rational(self.config.precision)
-        else:
-            precision = self.config.precision
+        lower_bound = 0
+        region_bounds = [lower_bound] * len(regions)
         while upper_bound - lower_bound > precision:
             iteration += 1
             if iteration == 1:
@@ -175,9 +218,10 @@ class PLASingle:
                 for region in regions:
                     # Split region into two
                     self.no_splits += 1
-                    new_regions.extend(region.split(self.vars))
+                    new_regions.extend(region.split(self.vars, self.config.split_strategy))
 
-            regions, sample, lower_bound, upper_bound = self.compute_satisfying_regions(upper_bound, new_regions)
+            previous_lower_bound = lower_bound
+            regions, region_bounds, unchecked, sample, lower_bound, upper_bound = self.compute_satisfying_regions(upper_bound, new_regions)
             iteration_time = time.time() - start_time_pla
             start_time_pla = time.time()
             logging.info("Iteration {}: bounds: [{}, {}], best sample: {}, {} regions remaining, {} calls, {} splits, time: {:.3f}s".format(iteration, lower_bound, upper_bound,
@@ -186,8 +230,38 @@ class PLASingle:
                                                                                                                                             iteration_time))
             if sample is not None:
                 best_sample = sample
+                upper_bound, best_sample = self.improve_upper_bound(upper_bound, best_sample)
 
-            if verbose:
+            if unchecked:
+                # The budget was exhausted during the iteration
+                # The lower bound of the previous iteration is a lower bound for the unchecked regions
+                logging.warning("Stopping refinement early due to {}".format(self.incomplete))
+                lower_bound = min(lower_bound, previous_lower_bound)
+                if self.checkpoint is not None:
+                    # Keep the state to resume the run later
+                    next_regions = [new_region for region in regions for new_region in region.split(self.vars, self.config.split_strategy)]
+                    self.save_checkpoint(next_regions + unchecked, lower_bound, upper_bound, best_sample, self.no_splits + len(regions), force=True)
+                region_bounds = region_bounds + [previous_lower_bound] * len(unchecked)
+                regions = regions + unchecked
+                break
+
+            if self.checkpoint is not None and self.checkpoint.due():
+                # Store the sub-regions which are checked in the next iteration
+                next_regions = [new_region for region in regions for new_region in region.split(self.vars, self.config.split_strategy)]
+                self.save_checkpoint(next_regions, lower_bound, upper_bound, best_sample, self.no_splits + len(regions))
+
+            if upper_bound - lower_bound > precision:
+                # The next iteration takes at least as long as the current one
+                self.incomplete = self.budget.exhausted(iteration_time)
+                if self.incomplete is not None:
+                    logging.warning("Stopping refinement early due to {}".format(self.incomplete))
+                    if self.checkpoint is not None:
+                        # Keep the state to resume the run later
+                        next_regions = [new_region for region in regions for new_region in region.split(self.vars, self.config.split_strategy)]
+                        self.save_checkpoint(next_regions, lower_bound, upper_bound, best_sample, self.no_splits + len(regions), force=True)
+                    break
+
+            if self.verbose:
                 logging.debug("------------")
                 if self.config.exact:
                     logging.debug("Current bounds: [{}, {}], precision: {}".format(lower_bound, upper_bound, upper_bound - lower_bound))
@@ -200,6 +274,210 @@ class PLASingle:
                 logging.debug("Time: {:.3f}s".format(time.time() - start_time_pla))
                 logging.debug("------------")
 
+        return regions, lower_bound, upper_bound, best_sample, region_bounds
+
+    def refine_best_first(self, initial_regions, upper_bound, best_sample, precision):
+        """
+        Refine regions in best-first order until the bounds are precise enough.
+        The frontier is ordered by the lower bound of the regions and the most promising region is always refined first.
+        Regions whose lower bound exceeds the upper bound are pruned lazily when the upper bound improves.
+        :param initial_regions: Initial regions.
+        :param upper_bound: Initial upper bound.
+        :param best_sample: Sample corresponding to upper bound.
+        :param precision: Precision.
+        :return: Tuple (remaining regions, lower bound, upper bound, best sample, lower bounds of the remaining regions).
+        """
+        # Frontier of tuples (lower bound of parent, counter, region)
+        counter = itertools.count()
+        frontier = SortedKeyList([(0, next(counter), region) for region in initial_regions], key=lambda entry: (entry[0], entry[1]))
+        start_time_pla = time.time()
+        last_log = start_time_pla
+        while frontier and upper_bound - frontier[0][0] > precision:
+            self.incomplete = self.budget.exhausted()
+            if self.incomplete is not None:
+                logging.warning("Stopping refinement early due to {}".format(self.incomplete))
+                # Keep the state to resume the run later
+                self.save_checkpoint([region for _, _, region in frontier], frontier[0][0], upper_bound, best_sample, self.no_splits, force=True)
+                break
+            _, _, region = frontier.pop(0)
+            if region.is_point():
+                # Regions collapsed to a single point are resolved by a single instantiation
+                point = region.middle()
+                sample = self.inst_checker.check(self.env, point.carl_valuation(self.vars)).at(self.initial_state)
+                logging.debug("Result for point region {}: {}".format(point, sample))
+                if sample < upper_bound:
+                    upper_bound, best_sample = self.improve_upper_bound(sample, point)
+                    del frontier[frontier.bisect_key_right((upper_bound, float("inf"))):]
+                continue
+            self.no_calls += 1
+            result = pla_helper.get_bound_region(region, self.solver, self.env, self.vars, False)
+            if self.config.exact:
+                result = stormpy.Rational(result)
+            else:
+                result = float(result)
+            logging.debug("Result for {}: {}".format(region, result))
+            if result > upper_bound:
+                # Discard region
+                continue
+
+            # Sample middle to possibly obtain better upper bound
+            point = region.middle()
+            sample = self.inst_checker.check(self.env, point.carl_valuation(self.vars)).at(self.initial_state)
+            logging.debug("Result for point {}: {}".format(point, sample))
+            if sample < upper_bound:
+                # Sample is new upper bound
+                upper_bound, best_sample = self.improve_upper_bound(sample, point)
+                # Prune all regions whose lower bound is greater than the new upper bound
+                del frontier[frontier.bisect_key_right((upper_bound, float("inf"))):]
+
+            # Split region and keep its lower bound for the sub-regions
+            self.no_splits += 1
+            for new_region in region.split(self.vars, self.config.split_strategy):
+                frontier.add((result, next(counter), new_region))
+
+            if time.time() - last_log > 1:
+                last_log = time.time()
+                logging.info("Progress: bounds: [{}, {}], best sample: {}, {} regions remaining, {} calls, {} splits, time: {:.3f}s".format(
+                    frontier[0][0], upper_bound, best_sample, len(frontier), self.no_calls, self.no_splits, last_log - start_time_pla))
+                self.save_checkpoint([region for _, _, region in frontier], frontier[0][0], upper_bound, best_sample, self.no_splits)
+
+        regions = [region for _, _, region in frontier]
+        # Sub-regions are not checked yet, the bound of their parent is a lower bound for them
+        region_bounds = [bound for bound, _, _ in frontier]
+        lower_bound = frontier[0][0] if frontier else upper_bound
+        logging.info("Finished: bounds: [{}, {}], best sample: {}, {} regions remaining, {} calls, {} splits, time: {:.3f}s".format(
+            lower_bound, upper_bound, best_sample, len(regions), self.no_calls, self.no_splits, time.time() - start_time_pla))
+        return regions, lower_bound, upper_bound, best_sample, region_bounds
+
+    def save_checkpoint(self, regions, lower_bound, upper_bound, best_sample, no_splits, force=False):
+        """
+        Write checkpoint if checkpointing is enabled and the last checkpoint is old enough.
+        :param regions: Regions which still have to be checked.
+        :param lower_bound: Current lower bound.
+        :param upper_bound: Current upper bound.
+        :param best_sample: Sample corresponding to upper bound.
+        :param no_splits: Number of splits including the splits needed for obtaining the given regions.
+        :param force: Whether the checkpoint is written regardless of the time of the last checkpoint.
+        """
+        if self.checkpoint is not None and (force or self.checkpoint.due()):
+            self.checkpoint.save([var.name for var in self.vars], regions, lower_bound, upper_bound, best_sample, self.no_calls, no_splits, self.config.exact,
+                                 self.point_regions)
+
+    def compute_initial_regions(self, roots):
+        """
+        Create initial regions by splitting the parameter space at the roots.
+        :param roots: Dictionary of all roots for each parameter.
+        :return: List of initial regions.
+        """
+        # Create initial intervals per parameter by splitting at roots
+        initial_intervals = dict()
+        for p in self.vars:
+            initial_interval = []
+            current = 0 + self.config.eps  # 0 and 1 change graph structure
+            for root in roots[p]:
+                initial_interval.append(Interval(current, root))
+                current = root
+            initial_interval.append(Interval(current, 1 - self.config.eps))
+            initial_intervals[p] = initial_interval
+        # Create initial regions
+        initial_regions = []
+        for product in itertools.product(*initial_intervals.values()):
+            region = {p.name: interval for p, interval in zip(self.vars, product)}
+            initial_regions.append(Region(region))
+        return initial_regions
+
+    def find_optimum(self, model_file, verbose=False, seed_sample=None):
+        """
+        Approximate the optimum via PLA.
+        :param model_file: Model file.
+        :param verbose: Whether to log additional information.
+        :param seed_sample: Promising point (e.g., the best sample of a smaller model of the same family) which is checked in addition to the sample points.
+        :return: Result.
+        """
+        logging.info("Running PLA on single process")
+        self.verbose = verbose
+        result = Result(model_file, self.config)
+        self.checkpoint = checkpoint.get_checkpoint(model_file, self.config)
+        resumed = self.checkpoint.load(self.config.exact) if self.config.resume else None
+        warm_start = None
+        if resumed is None and self.config.warm_start is not None:
+            warm_start = load_warm_start(self.config.warm_start, model_file, self.config.eps)
+
+        # Get initial regions by computing the roots
+        time_roots_start = time.time()
+        if resumed is not None:
+            initial_regions, _, upper_bound, best_sample, self.no_calls, self.no_splits, self.point_regions = resumed
+            result.resumed_regions = len(initial_regions)
+        elif warm_start is not None:
+            initial_regions, best_sample = warm_start
+            result.warm_start_regions = len(initial_regions)
+        else:
+            roots = analyse.gather_roots(self.model, self.vars, cache.get_root_cache(self.config))
+            initial_regions = self.compute_initial_regions(roots)
+        result.time_roots = time.time() - time_roots_start
+        logging.info("Computing roots took {}s".format(result.time_roots))
+
+        if verbose:
+            logging.debug("------------")
+            for region in initial_regions:
+                logging.debug("Initial region {}".format(region))
+            logging.debug("------------")
+
+        properties = stormpy.parse_properties("R=? [F \"stable\"]")
+        assert len(properties) == 1
+        property = properties[0]
+        self.inst_checker = pla_helper.init_instantiation_checker(self.model, property, self.config.exact)
+
+        # Find upper bound
+        start_pla = time.time()
+        logging.info("No. initial regions: {}".format(len(initial_regions)))
+        if resumed is None:
+            if warm_start is not None and best_sample is not None:
+                # Previous best sample is the initial upper bound
+                upper_bound = self.inst_checker.check(self.env, best_sample.carl_valuation(self.vars)).at(self.initial_state)
+            else:
+                upper_bound, best_sample = self.sample_points(self.vars, self.config.no_samples)
+                if seed_sample is not None and pla_helper.use_seed_sample(seed_sample, self.vars):
+                    seed_result = self.inst_checker.check(self.env, seed_sample.carl_valuation(self.vars)).at(self.initial_state)
+                    logging.info("Result for seed sample {}: {}".format(seed_sample, seed_result))
+                    if seed_result < upper_bound:
+                        upper_bound = seed_result
+                        best_sample = seed_sample
+                    initial_regions = pla_helper.prioritize_regions(initial_regions, seed_sample)
+            upper_bound, best_sample = self.improve_upper_bound(upper_bound, best_sample)
+            logging.info("Found upper bound {} for sample {}".format(upper_bound, best_sample))
+            logging.debug("Time: {:.3f}s".format(time.time() - start_pla))
+
+            if not self.config.exact and not self.config.certify:
+                # Slightly increase upper bound to avoid precision issues
+                upper_bound += 1e-4
+
+        self.solver = pla_helper.init_solver(None, self.model, self.env)
+
+        if self.config.monotonicity and resumed is None and warm_start is None:
+            initial_regions = self.collapse_monotone_regions(initial_regions)
+            self.point_regions = [region for region in initial_regions if region.is_point()]
+
+        if self.config.exact:
+            precision = stormpy.Rational(self.config.precision)
+        else:
+            precision = self.config.precision
+        if self.config.best_first:
+            regions, lower_bound, upper_bound, best_sample, region_bounds = self.refine_best_first(initial_regions, upper_bound, best_sample, precision)
+        else:
+            regions, lower_bound, upper_bound, best_sample, region_bounds = self.refine_synchronous(initial_regions, upper_bound, best_sample, precision)
+
+        if self.config.certify:
+            # Certify result of floating point refinement exactly
+            # Results of interrupted runs are only checked but not refined further
+            certifier = certify.Certifier(self.model, self.vars, self.env, max_rounds=0 if self.incomplete is not None else 10)
+            regions, lower_bound, upper_bound, best_sample, result.certified = certifier.certify(regions, region_bounds, self.point_regions, upper_bound, best_sample,
+                                                                                                stormpy.Rational(self.config.precision),
+                                                                                                self.config.split_strategy)
+            result.certification_calls = certifier.no_calls
+            result.certification_refinements = certifier.no_refinements
+            result.time_certification = certifier.time
+
         logging.info("Remaining regions: {}, best sample: {}, {} calls, {} splits".format(len(regions), best_sample, self.no_calls, self.no_splits))
 
         end_pla = time.time()
@@ -208,4 +486,13 @@ class PLASingle:
         result.result_ert = Interval(lower_bound, upper_bound)
         result.best_sample = best_sample
         result.result_region = sort_regions(regions, self.vars)
+        result.no_calls = self.no_calls
+        result.no_splits = self.no_splits
+        result.incomplete = self.incomplete
+        if self.config.local_search > 0:
+            result.local_search_evaluations = self.no_local_evaluations
+            result.local_search_improvements = self.no_local_improvements
+        if self.checkpoint is not None and self.incomplete is None:
+            # The analysis is finished and the checkpoint is not needed anymore
+            self.checkpoint.remove()
         return result
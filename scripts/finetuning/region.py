@@ -2,6 +2,9 @@ import re
 
 import stormpy
 
+# Strategies for splitting regions: along all variables or only along the variable with the widest interval
+SPLIT_STRATEGIES = ["all", "widest"]
+
 
 class Point:
     """
@@ -22,6 +25,18 @@ class Point:
         assert variable.name in self.val
         return self.val[variable.name]
 
+    def encode(self, names):
+        """
+        Encode point as tuple of values for sending it to other processes.
+        :param names: Ordered variable names.
+        :return: Tuple of values.
+        """
+        return tuple(self.val[name] for name in names)
+
+    @staticmethod
+    def decode(values, names):
+        return Point(dict(zip(names, values)))
+
     @staticmethod
     def parse(s):
         match = re.search(r"\((.*)\)", s)
@@ -111,7 +126,29 @@ class Region:
                 upper[var] = interval
         return [Region(lower), Region(upper)]
 
-    def split(self, variables):
+    def is_point(self):
+        return all(interval.lower == interval.upper for interval in self.intervals.values())
+
+    def contains(self, point):
+        return all(interval.lower <= point.val[var] <= interval.upper for var, interval in self.intervals.items())
+
+    def widest_variable(self, variables):
+        return max(variables, key=lambda var: self.intervals[var.name].upper - self.intervals[var.name].lower)
+
+    def split(self, variables, strategy="all"):
+        """
+        Split region in half.
+        :param variables: Variables.
+        :param strategy: Split strategy (see SPLIT_STRATEGIES).
+        :return: List of sub-regions. Regions collapsed to a single point cannot be split and yield no sub-regions.
+        """
+        # Intervals collapsed to a single value cannot be split further
+        variables = [var for var in variables if self.intervals[var.name].lower < self.intervals[var.name].upper]
+        if not variables:
+            return []
+        if strategy == "widest":
+            return self.split_single(self.widest_variable(variables))
+        assert strategy == "all"
         regions = [Region(self.intervals)]
         for var in variables:
             new_regions = []
@@ -120,6 +157,18 @@ class Region:
             regions = new_regions
         return regions
 
+    def encode(self, names):
+        """
+        Encode region as tuple of bounds for sending it to other processes.
+        :param names: Ordered variable names.
+        :return: Tuple of tuples (lower bound, upper bound).
+        """
+        return tuple((self.intervals[name].lower, self.intervals[name].upper) for name in names)
+
+    @staticmethod
+    def decode(bounds, names):
+        return Region({name: Interval(lower, upper) for name, (lower, upper) in zip(names, bounds)})
+
     def storm_region(self, variables):
         assert len(variables) == len(self.intervals)
         region = dict()
@@ -23,6 +23,21 @@ class Result:
         self.time_roots = 0
         self.time_analysis = 0
         self.time_total = 0
+        self.cache_hit = None
+        self.time_cache_saved = 0
+        self.simplification = None
+        self.time_simplification = 0
+        self.no_calls = None
+        self.no_splits = None
+        self.resumed_regions = None
+        self.incomplete = None
+        self.warm_start_regions = None
+        self.local_search_evaluations = None
+        self.local_search_improvements = None
+        self.certified = None
+        self.certification_calls = None
+        self.certification_refinements = None
+        self.time_certification = 0
         self.result_ert = None
         self.best_sample = None
         self.result_region = []
@@ -31,6 +46,10 @@ class Result:
     def __str__(self):
         s = "===== SUMMARY =====\n"
         s += "Result for '{}' with {}\n".format(self.file, self.config)
+        statistics = self.statistics()
+        if statistics:
+            s += "Statistics:\n"
+            s += "".join("\t{:<16}{}\n".format(name + ":", value) for name, value in statistics)
         s += "Times:\n"
         s += "\tBuilding:       {:.3f}s\n".format(self.time_build)
         s += "\tBisimulation:   {:.3f}s\n".format(self.time_bisimulation)
@@ -46,6 +65,79 @@ class Result:
         s += "\n".join("\t\t{}".format(region) for region in self.result_region)
         return s
 
+    def statistics(self):
+        """
+        Get additional statistics of the analysis.
+        :return: List of tuples (name, value).
+        """
+        statistics = []
+        if self.cache_hit is not None:
+            statistics.append(("Cache", "{}, saved {:.3f}s".format("hit" if self.cache_hit else "miss", self.time_cache_saved)))
+        if self.simplification is not None:
+            statistics.append(("Simplification", "{} in {:.3f}s".format(self.simplification, self.time_simplification)))
+        if self.no_calls is not None:
+            statistics.append(("Refinement", "{} calls, {} splits, strategy {}".format(self.no_calls, self.no_splits, self.config.split_strategy)))
+        if self.resumed_regions is not None:
+            statistics.append(("Resumed", "{} regions".format(self.resumed_regions)))
+        if self.incomplete is not None:
+            statistics.append(("Incomplete", "stopped due to {}".format(self.incomplete)))
+        if self.warm_start_regions is not None:
+            statistics.append(("Warm start", "{} regions".format(self.warm_start_regions)))
+        if self.local_search_evaluations is not None:
+            statistics.append(("Local search", "{} evaluations, {} improvements".format(self.local_search_evaluations, self.local_search_improvements)))
+        if self.certified is not None:
+            statistics.append(("Certification", "{} with {} calls, {} refinements in {:.3f}s".format("certified" if self.certified else "failed", self.certification_calls,
+                                                                                              self.certification_refinements, self.time_certification)))
+        return statistics
+
+    def parse_statistic(self, line):
+        """
+        Parse line of statistics.
+        :param line: Line.
+        :return: True iff the line contained a statistic.
+        """
+        match = re.search(r"\tCache:\s*(hit|miss), saved (.*)s", line)
+        if match:
+            self.cache_hit = match.group(1) == "hit"
+            self.time_cache_saved = float(match.group(2))
+            return True
+        match = re.search(r"\tSimplification:\s*(.*) in (.*)s$", line)
+        if match:
+            self.simplification = match.group(1)
+            self.time_simplification = float(match.group(2))
+            return True
+        match = re.search(r"\tRefinement:\s*(\d+) calls, (\d+) splits, strategy (.*)$", line)
+        if match:
+            self.no_calls = int(match.group(1))
+            self.no_splits = int(match.group(2))
+            self.config.split_strategy = match.group(3)
+            return True
+        match = re.search(r"\tResumed:\s*(\d+) regions", line)
+        if match:
+            self.resumed_regions = int(match.group(1))
+            return True
+        match = re.search(r"\tIncomplete:\s*stopped due to (.*)$", line)
+        if match:
+            self.incomplete = match.group(1)
+            return True
+        match = re.search(r"\tWarm start:\s*(\d+) regions", line)
+        if match:
+            self.warm_start_regions = int(match.group(1))
+            return True
+        match = re.search(r"\tLocal search:\s*(\d+) evaluations, (\d+) improvements", line)
+        if match:
+            self.local_search_evaluations = int(match.group(1))
+            self.local_search_improvements = int(match.group(2))
+            return True
+        match = re.search(r"\tCertification:\s*(certified|failed) with (\d+) calls, (\d+) refinements in (.*)s$", line)
+        if match:
+            self.certified = match.group(1) == "certified"
+            self.certification_calls = int(match.group(2))
+            self.certification_refinements = int(match.group(3))
+            self.time_certification = float(match.group(4))
+            return True
+        return False
+
     @staticmethod
     def parse_result(file):
         parse_state = 0
@@ -139,6 +231,8 @@ class Result:
                         if match:
                             parse_state += 1
                 elif parse_state == 8:
+                    if result.parse_statistic(line):
+                        continue
                     match = re.search(r"\tAnalysis:\s*(.*)s", line)
                     if match:
                         result.time_analysis = float(match.group(1))
@@ -179,3 +273,29 @@ class Result:
         if parse_state != 13 and not result.error:
             logging.warning("Ended in parsing state {} on {}".format(parse_state, file))
         return result
+
+
+def load_warm_start(file, model_file, eps):
+    """
+    Load the remaining regions and the best sample of a previous result for the same model.
+    :param file: Result file of previous run.
+    :param model_file: Model file of the current run.
+    :param eps: Minimal distance of the regions to the bounds 0 and 1.
+    :return: Tuple (regions, best sample). The best sample is None if the previous result does not contain one.
+    """
+    previous = Result.parse_result(file)
+    if previous is None or previous.error is not None or not previous.result_region:
+        raise ValueError("Result file '{}' does not contain remaining regions".format(file))
+    if previous.file != os.path.basename(model_file):
+        logging.warning("Result file '{}' was computed for model '{}' instead of '{}'".format(file, previous.file, os.path.basename(model_file)))
+    # Bounds are printed with 8 decimals. Widen the regions to ensure that they contain the original ones.
+    margin = 1e-8
+    regions = []
+    for region in previous.result_region:
+        intervals = {var: Interval(max(interval.lower - margin, eps), min(interval.upper + margin, 1 - eps)) for var, interval in region.intervals.items()}
+        regions.append(Region(intervals))
+    best_sample = None
+    if previous.best_sample is not None:
+        best_sample = Point({var: float(value) for var, value in previous.best_sample.val.items()})
+    logging.info("Warm start from {} with {} regions and best sample {}".format(file, len(regions), best_sample))
+    return regions, best_sample
@@ -0,0 +1,213 @@
+import math
+from fractions import Fraction
+
+# Default width of the isolating intervals returned by isolate_roots
+PRECISION = Fraction(1, 2 ** 40)
+
+
+def polynomial_coefficients(polynomial):
+    """
+    Get the coefficients of a univariate polynomial.
+    :param polynomial: Univariate pycarl polynomial (factorized or not).
+    :return: List of exact coefficients where the i-th entry is the coefficient of x^i.
+    """
+    if hasattr(polynomial, "polynomial"):
+        polynomial = polynomial.polynomial()
+    coefficients = []
+    for term in polynomial:
+        degree = term.tdeg
+        if degree >= len(coefficients):
+            coefficients.extend([Fraction(0)] * (degree + 1 - len(coefficients)))
+        coefficients[degree] += Fraction(str(term.coeff))
+    return trim(coefficients)
+
+
+def trim(p):
+    """
+    Remove leading zero coefficients.
+    :param p: Coefficients.
+    :return: Coefficients without leading zeros. The zero polynomial is the empty list.
+    """
+    p = list(p)
+    while p and p[-1] == 0:
+        p.pop()
+    return p
+
+
+def evaluate(p, x):
+    result = 0
+    for coeff in reversed(p):
+        result = result * x + coeff
+    return result
+
+
+def derive(p):
+    return [i * coeff for i, coeff in enumerate(p)][1:]
+
+
+def divide(p, q):
+    """
+    Polynomial division.
+    :param p: Dividend.
+    :param q: Divisor (not zero).
+    :return: Tuple (quotient, remainder).
+    """
+    assert q
+    remainder = list(p)
+    quotient = [Fraction(0)] * max(len(p) - len(q) + 1, 0)
+    lead = q[-1]
+    for shift in range(len(p) - len(q), -1, -1):
+        factor = Fraction(remainder[shift + len(q) - 1]) / lead
+        quotient[shift] = factor
+        if factor != 0:
+            for i, coeff in enumerate(q):
+                remainder[shift + i] -= factor * coeff
+    return trim(quotient), trim(remainder[:len(q) - 1])
+
+
+def gcd(p, q):
+    while q:
+        p, q = q, divide(p, q)[1]
+    # Normalize to monic polynomial
+    return [Fraction(coeff) / p[-1] for coeff in p] if p else p
+
+
+def squarefree(p):
+    """
+    Compute the square-free part of a polynomial, i.e., the polynomial with the same roots but all of multiplicity one.
+    :param p: Polynomial.
+    :return: Square-free part.
+    """
+    g = gcd(p, derive(p))
+    if len(g) <= 1:
+        return p
+    return divide(p, g)[0]
+
+
+def normalize(p):
+    """
+    Normalize a polynomial such that polynomials with the same roots are likely equal.
+    The square-free part is scaled to coprime integer coefficients with a positive leading coefficient.
+    :param p: Polynomial.
+    :return: Tuple of integer coefficients.
+    """
+    p = trim(p)
+    if len(p) > 1:
+        p = squarefree(p)
+    if not p:
+        return ()
+    denominator = 1
+    for coeff in p:
+        denominator = denominator * Fraction(coeff).denominator // math.gcd(denominator, Fraction(coeff).denominator)
+    integers = [int(coeff * denominator) for coeff in p]
+    content = 0
+    for coeff in integers:
+        content = math.gcd(content, coeff)
+    if integers[-1] < 0:
+        content = -content
+    return tuple(coeff // content for coeff in integers)
+
+
+def sturm_sequence(p):
+    """
+    Compute the Sturm sequence of a square-free polynomial.
+    :param p: Square-free polynomial.
+    :return: List of polynomials.
+    """
+    sequence = [p, derive(p)]
+    while sequence[-1]:
+        remainder = divide(sequence[-2], sequence[-1])[1]
+        if not remainder:
+            break
+        sequence.append([-coeff for coeff in remainder])
+    return sequence
+
+
+def sign_variations(sequence, x):
+    """
+    Count the sign variations of the Sturm sequence at a point. Zeros are ignored.
+    :param sequence: Sturm sequence.
+    :param x: Point.
+    :return: Number of sign variations.
+    """
+    variations = 0
+    last = 0
+    for p in sequence:
+        value = evaluate(p, x)
+        if value != 0:
+            if last != 0 and (value > 0) != (last > 0):
+                variations += 1
+            last = value
+    return variations
+
+
+def refine(p, lower, upper, precision):
+    """
+    Refine isolating interval by bisection.
+    :param p: Square-free polynomial with exactly one root in (lower, upper].
+    :param lower: Lower bound.
+    :param upper: Upper bound.
+    :param precision: Maximal width of the resulting interval.
+    :return: Tuple (lower, upper) containing the root. Both bounds are equal if the root was hit exactly.
+    """
+    value_upper = evaluate(p, upper)
+    if value_upper == 0:
+        return upper, upper
+    while upper - lower > precision:
+        middle = (lower + upper) / 2
+        value = evaluate(p, middle)
+        if value == 0:
+            return middle, middle
+        if (value > 0) == (value_upper > 0):
+            upper, value_upper = middle, value
+        else:
+            lower = middle
+    return lower, upper
+
+
+def isolate_roots(p, lower=Fraction(0), upper=Fraction(1), precision=PRECISION):
+    """
+    Isolate all real roots of a polynomial in the open interval (lower, upper).
+    The computation is exact and relies on Sturm sequences and bisection.
+    :param p: Coefficients of the polynomial.
+    :param lower: Lower bound.
+    :param upper: Upper bound.
+    :param precision: Maximal width of the isolating intervals.
+    :return: Sorted list of tuples (lower, upper) where each interval contains exactly one root.
+             Both bounds are equal if the root is rational and was found exactly.
+             The zero polynomial has no isolated roots and yields the empty list.
+    """
+    p = trim(p)
+    if len(p) <= 1:
+        return []
+    p = squarefree(p)
+    sequence = sturm_sequence(p)
+    roots = []
+    # Stack of intervals (a, b] with the number of distinct roots contained in them
+    count = sign_variations(sequence, lower) - sign_variations(sequence, upper)
+    stack = [(lower, upper, count)]
+    while stack:
+        a, b, count = stack.pop()
+        if count == 0:
+            continue
+        if count == 1:
+            roots.append(refine(p, a, b, precision))
+            continue
+        middle = (a + b) / 2
+        variations_middle = sign_variations(sequence, middle)
+        stack.append((a, middle, sign_variations(sequence, a) - variations_middle))
+        stack.append((middle, b, variations_middle - sign_variations(sequence, b)))
+    # Roots in (lower, upper] were counted but the upper bound itself is excluded
+    return sorted(root for root in roots if root[0] != upper)
+
+
+def find_roots(p, lower=Fraction(0), upper=Fraction(1), precision=PRECISION):
+    """
+    Compute all real roots of a polynomial in the open interval (lower, upper).
+    :param p: Coefficients of the polynomial.
+    :param lower: Lower bound.
+    :param upper: Upper bound.
+    :param precision: Maximal width of the isolating intervals.
+    :return: Sorted list of roots as floats (midpoints of the isolating intervals).
+    """
+    return [float((a + b) / 2) for a, b in isolate_roots(p, lower, upper, precision)]
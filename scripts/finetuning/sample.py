@@ -1,3 +1,5 @@
+import collections
+import heapq
 import logging
 import itertools
 import math
@@ -5,17 +7,17 @@ import math
 import stormpy
 
 import finetuning.pla_helper as pla_helper
-from finetuning.region import Point
+import finetuning.pla_parallel as pla_parallel
+from finetuning.region import Point, Interval, Region
 
 
-def generate_sample_points(parameters, no_samples_per_parameter, near_bounds=False, eps=1e-10):
+def sample_values(no_samples_per_parameter, near_bounds=False, eps=1e-10):
     """
-    Generate sample points.
-    :param parameters: Parameters.
+    Generate sample values for a single parameter.
     :param no_samples_per_parameter: Number of samples per parameter.
     :param near_bounds: Whether additional samples near the bounds should be generated.
     :param eps: Epsilon for minimal distance to bounds if near_bounds is set.
-    :return: List of sample points.
+    :return: List of values.
     """
     size = 1.0 / (no_samples_per_parameter + 1)
     values = []
@@ -26,14 +28,34 @@ def generate_sample_points(parameters, no_samples_per_parameter, near_bounds=Fal
         values.append(val)
     if near_bounds:
         values.append(1 - eps)
+    return values
+
+
+def count_sample_points(parameters, no_samples_per_parameter, near_bounds=False):
+    """
+    Get number of sample points generated by generate_sample_points.
+    :param parameters: Parameters.
+    :param no_samples_per_parameter: Number of samples per parameter.
+    :param near_bounds: Whether additional samples near the bounds are generated.
+    :return: Number of sample points.
+    """
+    return (no_samples_per_parameter + (2 if near_bounds else 0)) ** len(parameters)
 
+
+def generate_sample_points(parameters, no_samples_per_parameter, near_bounds=False, eps=1e-10):
+    """
+    Generate sample points lazily.
+    The points are always generated in the same order.
+    :param parameters: Parameters.
+    :param no_samples_per_parameter: Number of samples per parameter.
+    :param near_bounds: Whether additional samples near the bounds should be generated.
+    :param eps: Epsilon for minimal distance to bounds if near_bounds is set.
+    :return: Iterator over sample points.
+    """
+    values = sample_values(no_samples_per_parameter, near_bounds, eps)
     # Sample points are Cartesian product of values
-    d = {p: values for p in parameters}
-    sample_points = []
-    for p in itertools.product(*d.values()):
-        point = Point({var.name: val for var, val in zip(parameters, p)})
-        sample_points.append(point)
-    return sample_points
+    for p in itertools.product(values, repeat=len(parameters)):
+        yield Point({var.name: val for var, val in zip(parameters, p)})
 
 
 def sample(model, formula, parameters, sample_points, exact=False):
@@ -42,42 +64,366 @@ def sample(model, formula, parameters, sample_points, exact=False):
     :param model: Model.
     :param formula: Property.
     :param parameters: Parameters.
-    :param sample_points: Sample points.
+    :param sample_points: Iterable of sample points.
     :param exact: Whether exact methods should be used.
-    :return: List of tuples (sample point, sample).
+    :return: Iterator over tuples (sample point, sample).
     """
     # Prepare
     initial_state = model.initial_states[0]
     env = stormpy.Environment()
     inst_checker = pla_helper.init_instantiation_checker(model, formula, exact)
     # Sample all points
-    samples = []
     for point in sample_points:
         result = inst_checker.check(env, point.carl_valuation(parameters)).at(initial_state)
-        samples.append((point, result))
         logging.debug("Result for point {}: {}".format(point, result))
+        yield point, result
+
+
+def sample_parallel(model, parameters, sample_points, config, no_points=None, batch_size=1000):
+    """
+    Sample model at given points with a pool of worker processes.
+    Only a bounded number of batches is pending at any time such that the sample points can be generated lazily.
+    :param model: Model.
+    :param parameters: Parameters.
+    :param sample_points: Iterable of sample points.
+    :param config: Configuration.
+    :param no_points: Number of sample points (optional). Used for choosing smaller batches for few points.
+    :param batch_size: Maximal number of points per task.
+    :return: Iterator over tuples (sample point, sample) in the order of the sample points.
+    """
+    names = [p.name for p in parameters]
+    if no_points is not None:
+        # Keep enough tasks per process for load balancing
+        batch_size = max(1, min(batch_size, no_points // (4 * config.processes)))
+    encoded_points = (point.encode(names) for point in sample_points)
+    with pla_parallel.worker_pool(model, config) as (pool, _, _):
+        # Results are returned in the order of the batches
+        pending = collections.deque()
+        while True:
+            batch = list(itertools.islice(encoded_points, batch_size))
+            if batch:
+                pending.append(pool.apply_async(pla_parallel.sample_points_parallel, ((batch, config.exact),)))
+            if pending and (not batch or len(pending) >= 4 * config.processes):
+                for result, encoded in pending.popleft().get():
+                    point = Point.decode(encoded, names)
+                    logging.debug("Result for point {}: {}".format(point, result))
+                    yield point, result
+            elif not batch:
+                break
+
+
+def instantiation_evaluator(model, formula, parameters, exact=False):
+    """
+    Create function sampling the model in the current process.
+    :param model: Model.
+    :param formula: Property.
+    :param parameters: Parameters.
+    :param exact: Whether exact methods should be used.
+    :return: Function mapping a list of sample points to the list of samples.
+    """
+    initial_state = model.initial_states[0]
+    env = stormpy.Environment()
+    inst_checker = pla_helper.init_instantiation_checker(model, formula, exact)
+    return lambda points: [inst_checker.check(env, point.carl_valuation(parameters)).at(initial_state) for point in points]
+
+
+def pool_evaluator(pool, parameters, config):
+    """
+    Create function sampling the model with a pool of worker processes (see pla_parallel.worker_pool).
+    :param pool: Process pool.
+    :param parameters: Parameters.
+    :param config: Configuration.
+    :return: Function mapping a list of sample points to the list of samples.
+    """
+    names = [p.name for p in parameters]
 
-    return samples
+    def evaluate(points):
+        batch_size = max(1, len(points) // (4 * config.processes))
+        tasks = [(batch, config.exact) for batch in pla_parallel.batches([point.encode(names) for point in points], batch_size)]
+        return [result for results in pool.map(pla_parallel.sample_points_parallel, tasks) for result, _ in results]
 
+    return evaluate
 
-def export_csv(csv_file, samples, parameters, max_value=math.inf):
+
+class AdaptiveSampler:
+    """
+    Adaptive sampling which starts from a coarse grid of cells and refines the most interesting cells until the budget is used up.
+    A cell is sampled at its corners. Its priority is its width times the sum of
+    - the variation of the samples in the cell and
+    - the proximity of its smallest sample to the overall minimum (relative to the range of all samples).
+    Thus, cells in which the reward changes fast or which are close to the minimum are refined first.
+    The samples of a cell are its corners and all samples on its boundary obtained by refining neighbouring cells.
+    The priorities of all cells next to new samples are updated after each refinement step.
+    Refining a cell splits it in half along all parameters. Corners shared by neighbouring cells are only sampled once.
+    """
+
+    def __init__(self, parameters, evaluate, budget, max_value=math.inf, cells_per_step=1, min_width=1e-6):
+        """
+        Constructor.
+        :param parameters: Parameters.
+        :param evaluate: Function mapping a list of sample points to the list of samples.
+        :param budget: Maximal number of samples. Must be at least the number of points of the initial grid.
+        :param max_value: Maximal value for samples in the priorities. Everything >max_value is set to max_value.
+        :param cells_per_step: Number of cells which are refined together, e.g., to sample the new corners in parallel.
+        :param min_width: Cells smaller than this width are not refined further.
+        """
+        self.parameters = parameters
+        self.names = [p.name for p in parameters]
+        self.evaluate = evaluate
+        self.budget = budget
+        self.max_value = max_value
+        self.cells_per_step = cells_per_step
+        self.min_width = min_width
+        self.samples = dict()  # Encoded point -> sample as float
+        self.no_samples = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        # Heap of tuples (negative priority, key, cell), entries with outdated priorities are skipped
+        self.cells = []
+        # Cells which can still be refined: key -> (cell, samples in cell, priority)
+        self.active = dict()
+        # Keys of the active cells containing each sample
+        self.index = collections.defaultdict(set)
+        # Cells which are too small for refinement
+        self.finished = []
+        self.counter = itertools.count()
+
+    def corners(self, cell):
+        return list(itertools.product(*[(cell.intervals[name].lower, cell.intervals[name].upper) for name in self.names]))
+
+    def new_corners(self, cells):
+        corners = dict.fromkeys(corner for cell in cells for corner in self.corners(cell))
+        return [corner for corner in corners if corner not in self.samples]
+
+    def sample_corners(self, corners):
+        """
+        Sample new corners.
+        :param corners: Encoded points which are not sampled yet.
+        :return: List of tuples (sample point, sample).
+        """
+        points = [Point.decode(corner, self.names) for corner in corners]
+        results = self.evaluate(points)
+        for corner, result in zip(corners, results):
+            value = min(float(result), self.max_value)
+            self.samples[corner] = value
+            self.minimum = min(self.minimum, value)
+            self.maximum = max(self.maximum, value)
+        self.no_samples += len(corners)
+        return list(zip(points, results))
+
+    @staticmethod
+    def width(cell):
+        return max(interval.upper - interval.lower for interval in cell.intervals.values())
+
+    def contains(self, cell, corner):
+        return all(cell.intervals[name].lower <= value <= cell.intervals[name].upper for name, value in zip(self.names, corner))
+
+    def neighbours(self, points):
+        """
+        Get the keys of all active cells which touch a cell with the given samples.
+        As all cells are obtained by halving the cells of a grid, the smaller of two touching cells has a corner on the boundary of the larger one.
+        Thus, touching cells share a sample.
+        """
+        return set(key for point in points for key in self.index.get(point, ()))
+
+    def add_points(self, key, points):
+        self.active[key][1].update(points)
+        for point in points:
+            self.index[point].add(key)
+
+    def priority(self, cell, points):
+        values = [self.samples[point] for point in points]
+        # The proximity spread - (min(values) - minimum) simplifies to maximum - min(values)
+        return self.width(cell) * (max(values) - min(values) + self.maximum - min(values))
+
+    def update_priority(self, key):
+        cell, points, _ = self.active[key]
+        priority = self.priority(cell, points)
+        self.active[key] = (cell, points, priority)
+        heapq.heappush(self.cells, (-priority, key, cell))
+
+    def add_cells(self, cells, parent_points=()):
+        """
+        Add new cells.
+        :param cells: Cells.
+        :param parent_points: Samples of the refined cell, the samples contained in a new cell are kept.
+        :return: Keys of the new active cells.
+        """
+        keys = []
+        for cell in cells:
+            if self.width(cell) < self.min_width:
+                self.finished.append(cell)
+                continue
+            key = next(self.counter)
+            self.active[key] = (cell, set(), None)
+            self.add_points(key, self.corners(cell))
+            self.add_points(key, [point for point in parent_points if self.contains(cell, point)])
+            keys.append(key)
+        return keys
+
+    def remove_cell(self, key):
+        cell, points, _ = self.active.pop(key)
+        for point in points:
+            self.index[point].discard(key)
+        return cell, points
+
+    def top(self):
+        """
+        Get the cell with the highest priority, outdated heap entries are dropped.
+        :return: Tuple (key, cell) or None if no cell can be refined anymore.
+        """
+        while self.cells:
+            priority, key, cell = self.cells[0]
+            if key in self.active and self.active[key][2] == -priority:
+                return key, cell
+            heapq.heappop(self.cells)
+        return None
+
+    def sample(self, no_samples_per_parameter, eps=1e-10):
+        """
+        Sample adaptively.
+        :param no_samples_per_parameter: Number of samples per parameter for the initial grid.
+        :param eps: Epsilon for minimal distance to bounds.
+        :return: Iterator over tuples (sample point, sample) in the order in which they are computed.
+        """
+        no_initial = count_sample_points(self.parameters, no_samples_per_parameter, near_bounds=True)
+        if no_initial > self.budget:
+            raise ValueError("Budget of {} samples is smaller than the initial grid with {} points".format(self.budget, no_initial))
+        values = sample_values(no_samples_per_parameter, near_bounds=True, eps=eps)
+        intervals = [Interval(lower, upper) for lower, upper in zip(values, values[1:])]
+        cells = [Region({name: interval for name, interval in zip(self.names, product)}) for product in
+                 itertools.product(intervals, repeat=len(self.names))]
+        yield from self.sample_corners(self.new_corners(cells))
+        for key in self.add_cells(cells):
+            self.update_priority(key)
+        logging.info("Sampled initial grid with {} cells and {} points".format(len(cells), self.no_samples))
+
+        while True:
+            # Refine the most interesting cells as long as their new corners fit into the budget
+            refined = []
+            new_cells = []
+            while len(refined) < self.cells_per_step:
+                entry = self.top()
+                if entry is None:
+                    break
+                key, cell = entry
+                sub_cells = cell.split(self.parameters)
+                if self.no_samples + len(self.new_corners(new_cells + sub_cells)) > self.budget:
+                    break
+                heapq.heappop(self.cells)
+                refined.append(self.remove_cell(key) + (sub_cells,))
+                new_cells.extend(sub_cells)
+            if not refined:
+                break
+            corners = self.new_corners(new_cells)
+            maximum = self.maximum
+            yield from self.sample_corners(corners)
+
+            updated = set()
+            for _, points, sub_cells in refined:
+                updated.update(self.add_cells(sub_cells, points))
+            for cell, points, _ in refined:
+                # New samples lie within the refined cell and possibly on the boundary of its neighbours
+                new_points = [corner for corner in corners if self.contains(cell, corner)]
+                for key in self.neighbours(points):
+                    other, other_points, _ = self.active[key]
+                    contained = [point for point in new_points if point not in other_points and self.contains(other, point)]
+                    if contained:
+                        self.add_points(key, contained)
+                        updated.add(key)
+            if self.maximum != maximum:
+                # The proximity of all cells depends on the maximum
+                updated = list(self.active)
+                self.cells = []
+            for key in updated:
+                self.update_priority(key)
+        logging.info("Adaptive sampling used {} of {} samples for {} cells".format(self.no_samples, self.budget, len(self.active) + len(self.finished)))
+
+    def final_cells(self):
+        """
+        Get the cells of the final refinement.
+        :return: List of tuples (cell, minimal sample, maximal sample).
+        """
+        cells = []
+        for cell in self.finished + [cell for cell, _, _ in self.active.values()]:
+            values = [self.samples[corner] for corner in self.corners(cell)]
+            cells.append((cell, min(values), max(values)))
+        return cells
+
+
+def export_cells(cells_file, cells, parameters):
+    """
+    Export cell structure of adaptive sampling as CSV file.
+    :param cells_file: CSV file.
+    :param cells: List of tuples (cell, minimal sample, maximal sample).
+    :param parameters: Parameters.
+    """
+    with open(cells_file, 'w') as f:
+        for param in parameters:
+            f.write("{0}_lower;{0}_upper;".format(param))
+        f.write("min;max\n")
+        for cell, minimum, maximum in cells:
+            for param in parameters:
+                interval = cell.intervals[param.name]
+                f.write("{};{};".format(interval.lower, interval.upper))
+            f.write("{};{}\n".format(minimum, maximum))
+
+
+def write_csv_header(f, parameters):
+    for param in parameters:
+        f.write("{};".format(param))
+    f.write("sample\n")
+
+
+def resume_csv(csv_file, parameters):
+    """
+    Prepare a partially written CSV file for appending further samples.
+    An incomplete last row (e.g., from an interrupted run) is removed.
+    :param csv_file: CSV file.
+    :param parameters: Parameters.
+    :return: Number of complete rows in the file.
+    """
+    header = ("".join("{};".format(param) for param in parameters) + "sample\n").encode()
+    with open(csv_file, 'rb+') as f:
+        first_line = f.readline()
+        if not first_line.endswith(b"\n"):
+            # Header is incomplete
+            f.truncate(0)
+            return 0
+        if first_line != header:
+            raise ValueError("CSV file '{}' was written for different parameters".format(csv_file))
+        no_rows = 0
+        end = f.tell()
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            no_rows += 1
+            end += len(line)
+        f.truncate(end)
+    return no_rows
+
+
+def export_csv(csv_file, samples, parameters, max_value=math.inf, append=False):
     """
     Export sample results as CSV file.
+    The rows are written as the samples are computed such that only a single sample is kept in memory.
     :param csv_file: CSV file.
-    :param samples: Samples.
+    :param samples: Iterable of samples.
     :param parameters: Parameters.
     :param max_value: Maximal value for samples. Everything >max_value is set to max_value.
+    :param append: Whether the samples are appended to an existing file (see resume_csv).
+    :return: Number of written samples.
     """
-    with open(csv_file, 'w') as f:
-        # Header
-        for param in parameters:
-            f.write("{};".format(param))
-        f.write("sample")
+    no_samples = 0
+    with open(csv_file, 'a' if append else 'w') as f:
+        if f.tell() == 0:
+            write_csv_header(f, parameters)
 
         # Write a row for each sample
         for point, sample in samples:
-            f.write("\n")
             for param in parameters:
                 f.write("{};".format(point.get_value(param)))
             val = sample if sample < max_value else max_value
-            f.write("{}".format(val))
+            f.write("{}\n".format(val))
+            no_samples += 1
+    return no_samples
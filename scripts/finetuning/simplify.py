@@ -0,0 +1,185 @@
+import logging
+import re
+import time
+
+import stormpy
+import stormpy.pars
+
+import finetuning.build as build
+import finetuning.pla_helper as pla_helper
+from finetuning.region import Interval, Region
+
+# Relative tolerance for comparing results of model variants (default precision of the solvers in Storm)
+TOLERANCE = 1e-6
+
+
+class Variant:
+    """
+    Model variant obtained by a reduction pipeline.
+    """
+
+    def __init__(self, name, model, time_reduction):
+        self.name = name
+        self.model = model
+        self.time_reduction = time_reduction
+        self.time_probes = None
+        self.probe_results = None  # Results of the instantiations at the middles of the probe regions
+        self.failure = None if model is not None else "failed"
+
+    def discard(self, reason):
+        self.model = None
+        self.failure = reason
+
+    def __str__(self):
+        if self.model is None:
+            return "{} ({})".format(self.name, self.failure)
+        return "{} ({} states, {} transitions, {:.3f}s reduction, {:.3f}s probes)".format(self.name, self.model.nr_states, self.model.nr_transitions,
+                                                                                           self.time_reduction, self.time_probes)
+
+
+def restore_target_label(model, formula):
+    """
+    Ensure that the target states of the (possibly simplified) formula are labelled with "stable".
+    The remaining analysis always uses the property R=? [F "stable"].
+    :param model: Model.
+    :param formula: Formula for the model.
+    :return: True iff the label could be restored.
+    """
+    match = re.search(r"F \"(.*)\"", str(formula))
+    if not match:
+        return False
+    label = match.group(1)
+    labeling = model.labeling
+    if label != "stable":
+        if not labeling.contains_label("stable"):
+            labeling.add_label("stable")
+        labeling.set_states("stable", labeling.get_states(label))
+    return len(model.reward_models) == 1
+
+
+def reduce_simplify(model, prop):
+    # Eliminate states with only constant outgoing transitions
+    model, formula = stormpy.pars.simplify_model(model, prop.raw_formula)
+    if not restore_target_label(model, formula):
+        raise RuntimeError("Simplified formula '{}' is not supported".format(formula))
+    return model
+
+
+def reduce_weak_bisimulation(model, prop):
+    return stormpy.perform_bisimulation(model, [prop], stormpy.BisimulationType.WEAK)
+
+
+def reduce_strong_bisimulation(model, prop):
+    return stormpy.perform_bisimulation(model, [prop], stormpy.BisimulationType.STRONG)
+
+
+# Reductions given as tuples (name, name of variant to start from, reduction)
+REDUCTIONS = [
+    ("simplification", "none", reduce_simplify),
+    ("weak bisimulation", "none", reduce_weak_bisimulation),
+    ("simplification+bisimulation", "simplification", reduce_strong_bisimulation),
+]
+
+
+def probe_regions(parameters, eps):
+    """
+    Get regions used for probing the PLA performance.
+    :param parameters: Parameters.
+    :param eps: Minimal distance to the bounds 0 and 1.
+    :return: List of regions.
+    """
+    return [Region({p.name: Interval(eps, 1 - eps) for p in parameters}),
+            Region({p.name: Interval(eps, 0.5) for p in parameters}),
+            Region({p.name: Interval(0.25, 0.75) for p in parameters})]
+
+
+def probe(variant, regions, prop, solver_type=None):
+    """
+    Measure the time needed for PLA on the given regions.
+    Afterwards, the model is instantiated at the middle of each region to compare the semantics of the variants.
+    :param variant: Model variant.
+    :param regions: Probe regions.
+    :param prop: Property.
+    :param solver_type: Linear equation solver type (optional).
+    """
+    env = stormpy.Environment()
+    if solver_type is not None:
+        env.solver_environment.set_linear_equation_solver_type(solver_type)
+    parameters = build.get_parameters(variant.model)
+    start_probes = time.time()
+    solver = pla_helper.init_solver(None, variant.model, env)
+    for region in regions:
+        result = pla_helper.get_bound_region(region, solver, env, parameters, False)
+        logging.debug("Probe result of {} for {}: {}".format(variant.name, region, result))
+    variant.time_probes = time.time() - start_probes
+
+    inst_checker = pla_helper.init_instantiation_checker(variant.model, prop, False)
+    initial_state = variant.model.initial_states[0]
+    variant.probe_results = [inst_checker.check(env, region.middle().carl_valuation(parameters)).at(initial_state) for region in regions]
+
+
+def same_results(variant, reference):
+    """
+    Check whether a variant yields the same results as the reference variant.
+    PLA bounds are not compared as they depend on the model structure and legitimately differ between equivalent models.
+    :param variant: Model variant.
+    :param reference: Reference variant.
+    :return: True iff all instantiation results agree up to the tolerance.
+    """
+    return all(abs(result - expected) <= TOLERANCE * max(1.0, abs(expected)) for result, expected in zip(variant.probe_results, reference.probe_results))
+
+
+def select_simplification(model, prop, config):
+    """
+    Try the available model reductions on the bisimulation quotient and keep the variant for which PLA is fastest.
+    :param model: Bisimulation quotient.
+    :param prop: Property.
+    :param config: Configuration.
+    :return: Tuple (model, list of all tried variants where the first one is the chosen one).
+    """
+    regions = probe_regions(build.get_parameters(model), config.eps)
+    variants = [Variant("none", model, 0)]
+    for name, base_name, reduction in REDUCTIONS:
+        base = next(variant for variant in variants if variant.name == base_name)
+        if base.model is None:
+            variants.append(Variant(name, None, 0))
+            continue
+        start_reduction = time.time()
+        try:
+            reduced = reduction(base.model, prop)
+        except Exception as e:
+            logging.info("Reduction {} failed: {}".format(name, e))
+            reduced = None
+        variants.append(Variant(name, reduced, base.time_reduction + time.time() - start_reduction))
+
+    # Warm up once such that the first probed variant does not pay for the initialisation alone
+    probe(Variant("warm-up", model, 0), regions[:1], prop, config.linear_equation_solver)
+    reference = variants[0]
+    for variant in variants:
+        if variant.model is not None:
+            probe(variant, regions, prop, config.linear_equation_solver)
+            if variant is not reference and not same_results(variant, reference):
+                # The reduction changed the semantics, e.g., the target label or the rewards were not preserved
+                logging.warning("Discarding model variant {} as its results {} differ from {}".format(variant.name, variant.probe_results, reference.probe_results))
+                variant.discard("results differ")
+        logging.info("Model variant {}".format(variant))
+
+    best = min((variant for variant in variants if variant.model is not None), key=lambda v: v.time_probes)
+    logging.info("Model after simplification ({}): {} states and {} transitions.".format(best.name, best.model.nr_states, best.model.nr_transitions))
+    return best.model, [best] + [variant for variant in variants if variant is not best]
+
+
+def simplify_model(model, prop, config):
+    """
+    Simplify model with the reduction pipeline which is fastest for PLA.
+    :param model: Bisimulation quotient.
+    :param prop: Property.
+    :param config: Configuration.
+    :return: Tuple (model, description of chosen and tried variants, time (s) for simplification).
+    """
+    start_simplification = time.time()
+    model, variants = select_simplification(model, prop, config)
+    time_simplification = time.time() - start_simplification
+    logging.info("Simplification took {}s".format(time_simplification))
+    description = "{}; tried: {}".format(variants[0], ", ".join(str(variant) for variant in variants[1:]))
+    return model, description, time_simplification
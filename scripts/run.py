@@ -1,50 +1,128 @@
 import argparse
+import contextlib
+import itertools
 import logging
 import math
 import os
 import time
 from enum import Enum
 
+import numpy
 from matplotlib import pyplot
 
 from finetuning import pla_single
 from finetuning import pla_parallel
 from finetuning import pla_old
+from finetuning.batch import BatchBuilder, BuildJob, collect_model_files
 import finetuning.analyse as analyse
 import finetuning.build as build
+import finetuning.cache as cache
 import finetuning.sample as sample
+import finetuning.simplify as simplify
 from finetuning.parser import get_ratfunc
 from finetuning.result import Result
 from finetuning.config import Config
+from finetuning.evaluator import RationalFunctionEvaluator
+from finetuning.region import SPLIT_STRATEGIES
 
 
 class TaskType(Enum):
     approx = 'approx'
     rat_func = 'rat_func'
     sample = 'sample'
+    build = 'build'
+    family = 'family'
 
     def __str__(self):
         return self.value
 
 
+def run_pla(file, config, model_cache, verbose, seed_sample=None):
+    """
+    Approximate optimum via (parallel) PLA.
+    :param file: Model file.
+    :param config: Configuration.
+    :param model_cache: Model cache (optional).
+    :param verbose: Whether to log additional information.
+    :param seed_sample: Promising point which is checked in addition to the sample points (optional).
+    :return: Result.
+    """
+    if config.processes > 1:
+        # Parallel PLA
+        parallel_pla = pla_parallel.PLAParallel(config)
+        return parallel_pla.find_optimum(file, verbose=verbose, seed_sample=seed_sample)
+
+    # Sequential PLA
+    # Building model
+    start_time = time.time()
+    model, program, prop, time_build, time_bisim = build.build_model(file, config.hybrid, sylvan_threads=1, sylvan_memory=config.memory_limit, cache=model_cache)
+    if config.simplify:
+        model, simplification, time_simplification = simplify.simplify_model(model, prop, config)
+    # PLA
+    single_pla = pla_single.PLASingle(model, config)
+    result = single_pla.find_optimum(file, verbose=verbose, seed_sample=seed_sample)
+    # Set result
+    result.time_build = time_build
+    result.time_bisimulation = time_bisim
+    if model_cache is not None:
+        result.cache_hit = model_cache.hit
+        result.time_cache_saved = model_cache.time_saved
+    if config.simplify:
+        result.simplification = simplification
+        result.time_simplification = time_simplification
+    result.time_total = time.time() - start_time
+    return result
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Analyse parametric self-stabilizing algorithms.')
 
     parser.add_argument('--task', type=TaskType, choices=list(TaskType), required=True)
-    parser.add_argument('--file', help='the prism file to analyse', required=True)
+    parser.add_argument('--file', help='the prism file to analyse (or directory/glob of prism files for tasks build and family)', required=True)
 
     # For approximation
     parser.add_argument('--approx', help='approximate the optimum up to the given precision', type=float, default=0)
     parser.add_argument('--parallel', '-p', help='enable parallelization of PLA with given number of processes', type=int, default=1)
+    parser.add_argument('--best-first', help='refine most promising regions first in single-process PLA', action="store_true")
+    parser.add_argument('--asynchronous', help='process regions asynchronously in parallel PLA', action="store_true")
+    parser.add_argument('--monotonicity', help='collapse regions in parameters in which the expected reward is monotone', action="store_true")
+    parser.add_argument('--split', help='split regions along all parameters or only along the widest interval', choices=SPLIT_STRATEGIES, default="all")
+    parser.add_argument('--worker-timeout', help='maximal time (in s) for parallel processes to load the model', type=int, default=3600)
+    parser.add_argument('--share-model', help='how parallel processes obtain the model (default: fork if available)', choices=["fork", "file"], default=None)
+    parser.add_argument('--model-format', help='format for exported and cached models', choices=["binary", "compressed", "drn"], default="drn")
     parser.add_argument('--hybrid', help='build symbolic model first', action="store_true")
     parser.add_argument('--old', help="use old implementation of PLA", action="store_true")
+    parser.add_argument('--simplify', help="select fastest model simplification before PLA", action="store_true")
+    parser.add_argument('--checkpoint', help='file for periodically saving the state of PLA', default=None)
+    parser.add_argument('--checkpoint-interval', help='minimal time (in s) between two checkpoints', type=int, default=60)
+    parser.add_argument('--resume', help='resume PLA from the checkpoint file or sampling from the csv file', action="store_true")
+    parser.add_argument('--warm-start', help='result file of a previous run to start from', default=None)
+    parser.add_argument('--deadline', help='time limit (in s) after which PLA stops with the results so far', type=float, default=None)
+    parser.add_argument('--max-rss', help='memory limit (in MB) of all processes after which PLA stops with the results so far', type=int, default=None)
+    parser.add_argument('--local-search', help='maximal number of evaluations of a local search around each new best sample (0 disables it)', type=int,
+                        default=0)
+
+    # For rational functions
+    parser.add_argument('--ratfunc', help='result file containing the rational function to analyse (instead of computing it from the model)', default=None)
+    parser.add_argument('--plot-file', help='file for saving the plot of the rational function', default=None)
+    parser.add_argument('--show-plot', help='show plot of the rational function', action="store_true")
+    parser.add_argument('--plot-points', help='number of points for plotting the rational function', type=int, default=10000)
 
     # For sampling
     parser.add_argument('--no-samples', help='number of samples per parameter', type=int, default=3)
     parser.add_argument('--csv', help='output csv file', default=None)
+    parser.add_argument('--adaptive', help='refine the sample grid adaptively with the given total number of samples', type=int, default=None)
+    parser.add_argument('--cells', help='output csv file for the cells of adaptive sampling', default=None)
+
+    # For batch building
+    parser.add_argument('--output', help='output directory for built models', default="built_models")
+    parser.add_argument('--batch-memory', help='memory available for batch building in MB (default: physical memory)', type=int, default=None)
 
     parser.add_argument('--exact', help="use exact numbers instead of floats", action="store_true")
+    parser.add_argument('--certify', help="use floats with sound bounds for PLA and certify the final result (exact upper bound, lower bound from sound PLA bounds)", action="store_true")
     parser.add_argument('--memory', help='memory limit', type=int, default=4096)
+    parser.add_argument('--cache', help='directory for caching built models', default=None)
+    parser.add_argument('--cache-size', help='maximal size of model cache in MB', type=int, default=None)
 
     parser.add_argument('--verbose', '-v', help='print more output', action="store_true")
     args = parser.parse_args()
@@ -56,11 +134,38 @@ if __name__ == "__main__":
     epsilon = 1e-10
 
     config = Config(args.hybrid, args.parallel, args.approx, args.memory, args.no_samples, args.exact)
+    config.cache_dir = args.cache
+    config.cache_size = args.cache_size
+    config.simplify = args.simplify
+    config.model_format = args.model_format
+    config.asynchronous = args.asynchronous
+    config.worker_timeout = args.worker_timeout
+    config.best_first = args.best_first
+    config.split_strategy = args.split
+    config.monotonicity = args.monotonicity
+    config.checkpoint_file = args.checkpoint
+    config.checkpoint_interval = args.checkpoint_interval
+    config.resume = args.resume
+    if args.deadline is not None:
+        config.deadline = time.time() + args.deadline
+    config.max_rss = args.max_rss
+    config.warm_start = args.warm_start
+    config.local_search = args.local_search
+    config.certify = args.certify
+    if args.share_model is not None:
+        config.model_sharing = args.share_model
+    model_cache = cache.get_model_cache(config)
 
     if task_type is TaskType.approx:
         if args.approx <= 0:
             logging.error("Approximation error must be greater than zero.")
             exit(1)
+        if args.certify and args.exact:
+            logging.error("Certification is only possible for floating point PLA and cannot be combined with --exact.")
+            exit(1)
+        if args.resume and (args.checkpoint is None or not os.path.exists(args.checkpoint)):
+            logging.error("Resuming requires an existing checkpoint file given by --checkpoint.")
+            exit(1)
 
         # Compute optima via PLA
         logging.info("Running PLA for '{}' with {}".format(args.file, config))
@@ -75,9 +180,13 @@ if __name__ == "__main__":
             result = Result(args.file, config)
             # Building model
             start_time = time.time()
-            model, program, _, time_build, time_bisim = build.build_model(args.file, config.hybrid, sylvan_threads=1, sylvan_memory=config.memory_limit)
+            model, program, _, time_build, time_bisim = build.build_model(args.file, config.hybrid, sylvan_threads=1, sylvan_memory=config.memory_limit,
+                                                                          cache=model_cache)
             result.time_build = time_build
             result.time_bisimulation = time_bisim
+            if model_cache is not None:
+                result.cache_hit = model_cache.hit
+                result.time_cache_saved = model_cache.time_saved
             # Get variable
             variables = build.get_parameters(model)
             # PLA
@@ -93,44 +202,104 @@ if __name__ == "__main__":
             result.result_region = optima
         else:
             # Use new (optimized) PLA computation
-            if config.processes > 1:
-                # Parallel PLA
-                parallel_pla = pla_parallel.PLAParallel(config)
-                result = parallel_pla.find_optimum(args.file, verbose=args.verbose)
-            else:
-                # Sequential PLA
-                # Building model
-                start_time = time.time()
-                model, program, _, time_build, time_bisim = build.build_model(args.file, config.hybrid, sylvan_threads=1, sylvan_memory=config.memory_limit)
-                # Get variable
-                variables = build.get_parameters(model)
-                # PLA
-                single_pla = pla_single.PLASingle(model, config)
-                result = single_pla.find_optimum(args.file, verbose=args.verbose)
-                # Set result
-                result.time_build = time_build
-                result.time_bisimulation = time_bisim
-                result.time_total = time.time() - start_time
+            result = run_pla(args.file, config, model_cache, args.verbose)
 
         logging.info(result)
 
+    elif task_type is TaskType.family:
+        if args.approx <= 0:
+            logging.error("Approximation error must be greater than zero.")
+            exit(1)
+        if args.warm_start is not None:
+            logging.error("A warm start result belongs to a single model and cannot be combined with --task family.")
+            exit(1)
+        if args.resume and args.checkpoint is None:
+            logging.error("Resuming requires the checkpoint file prefix given by --checkpoint.")
+            exit(1)
+        # Analyse models in increasing size and seed each run with the best sample of the previous one
+        jobs = sorted((BuildJob(file) for file in collect_model_files(args.file)), key=lambda j: (j.family, j.size))
+        seed_sample = None
+        family = None
+        for job in jobs:
+            if job.family != family:
+                family = job.family
+                seed_sample = None
+            if args.checkpoint is not None:
+                # Each model has its own checkpoint file
+                config.checkpoint_file = "{}.{}".format(args.checkpoint, job.name)
+                # Models without checkpoint were either finished or not started yet
+                config.resume = args.resume and os.path.exists(config.checkpoint_file)
+            logging.info("Running PLA for '{}' with {}".format(job.file, config))
+            result = run_pla(job.file, config, model_cache, args.verbose, seed_sample)
+            logging.info(result)
+            if result.best_sample is not None:
+                seed_sample = result.best_sample
+
     elif task_type is TaskType.sample:
         logging.info("Sampling points.")
         # Building model
-        model, _, formula, time_build, time_bisim = build.build_model(args.file, config.hybrid, sylvan_threads=config.processes, sylvan_memory=config.memory_limit)
+        model, _, formula, time_build, time_bisim = build.build_model(args.file, config.hybrid, sylvan_threads=config.processes, sylvan_memory=config.memory_limit,
+                                                                      cache=model_cache)
         parameters = build.get_parameters(model)
 
         # Sampling
         start_sampling = time.time()
-        sample_points = sample.generate_sample_points(parameters, config.no_samples, near_bounds=True, eps=config.eps)
-        samples = sample.sample(model, formula, parameters, sample_points, config.exact)
+        sampler = None
+        no_skipped = 0
+        with contextlib.ExitStack() as stack:
+            if args.adaptive is not None:
+                # Refine grid adaptively
+                no_initial = sample.count_sample_points(parameters, config.no_samples, near_bounds=True)
+                if args.adaptive < no_initial:
+                    logging.error("Adaptive sampling needs a budget of at least {} samples for the initial grid given by --no-samples.".format(no_initial))
+                    exit(1)
+                if config.processes > 1:
+                    pool, _, _ = stack.enter_context(pla_parallel.worker_pool(model, config))
+                    evaluate = sample.pool_evaluator(pool, parameters, config)
+                else:
+                    evaluate = sample.instantiation_evaluator(model, formula, parameters, config.exact)
+                sampler = sample.AdaptiveSampler(parameters, evaluate, args.adaptive, max_value=1000, cells_per_step=config.processes)
+                samples = sampler.sample(config.no_samples, config.eps)
+            else:
+                no_points = sample.count_sample_points(parameters, config.no_samples, near_bounds=True)
+                # Points are generated lazily and results are written as they are computed
+                sample_points = sample.generate_sample_points(parameters, config.no_samples, near_bounds=True, eps=config.eps)
+                if args.resume and args.csv and os.path.exists(args.csv):
+                    # Continue after the points already contained in the csv file
+                    no_skipped = sample.resume_csv(args.csv, parameters)
+                    sample_points = itertools.islice(sample_points, no_skipped, None)
+                    logging.info("Resuming sampling after {} of {} points".format(no_skipped, no_points))
+                if config.processes > 1:
+                    samples = sample.sample_parallel(model, parameters, sample_points, config, no_points=no_points - no_skipped)
+                else:
+                    samples = sample.sample(model, formula, parameters, sample_points, config.exact)
+            if args.csv:
+                no_sampled = sample.export_csv(args.csv, samples, parameters, max_value=1000, append=no_skipped > 0)
+                logging.info("Exported to {}".format(args.csv))
+            else:
+                no_sampled = 0
+                logging.info("Sample results:")
+                for point, result in samples:
+                    logging.info("{}: {}".format(point, result))
+                    no_sampled += 1
         time_sampling = time.time() - start_sampling
-        logging.info("Sampled {} points in {}s".format(len(sample_points), time_sampling))
-        sample_string = "\n".join(["{}: {}".format(point, sample) for point, sample in samples])
-        logging.info("Sample results:\n{}".format(sample_string))
-        if args.csv:
-            sample.export_csv(args.csv, samples, parameters, max_value=1000)
-            logging.info("Exported to {}".format(args.csv))
+        logging.info("Sampled {} points in {}s ({:.1f} samples/s)".format(no_sampled, time_sampling, no_sampled / max(time_sampling, 1e-9)))
+        if sampler is not None and args.cells:
+            sample.export_cells(args.cells, sampler.final_cells(), parameters)
+            logging.info("Exported cells to {}".format(args.cells))
+
+    elif task_type is TaskType.build:
+        # Build all models of a family in parallel
+        files = collect_model_files(args.file)
+        if not files:
+            logging.error("No model files found for '{}'.".format(args.file))
+            exit(1)
+        logging.info("Building {} models with {} processes".format(len(files), config.processes))
+        start_time = time.time()
+        builder = BatchBuilder(config, args.output, memory_budget=args.batch_memory)
+        jobs = builder.build(files)
+        failed = [job for job in jobs if job.error is not None]
+        logging.info("Built {} models in {:.3f}s, {} failed".format(len(jobs) - len(failed), time.time() - start_time, len(failed)))
 
     elif task_type is TaskType.rat_func:
         # Compute optima via rational function
@@ -148,37 +317,26 @@ if __name__ == "__main__":
         assert len(vars) == 1
         var = vars[0]
 
+        # Compile rational function once for fast evaluation of many points
+        evaluator = RationalFunctionEvaluator(ratFunc)
+
         if args.verbose:
             # Evaluation
-            evaluations = [{var: 0 + epsilon}, {var: 0.1}, {var: 0.2}, {var: 0.3}, {var: 0.4}, {var: 0.47}, {var: 0.5},
-                           {var: 0.53}, {var: 0.6}, {var: 0.64}, {var: 0.69}, {var: 0.7}, {var: 0.8}, {var: 0.9},
-                           {var: 1 - epsilon}]
-            results = analyse.evaluate_rational_function(ratFunc, evaluations)
+            evaluations = [0 + epsilon, 0.1, 0.2, 0.3, 0.4, 0.47, 0.5, 0.53, 0.6, 0.64, 0.69, 0.7, 0.8, 0.9, 1 - epsilon]
+            results = evaluator.evaluate(evaluations)
             logging.info("Evaluation:")
-            assert len(evaluations) == len(results)
-            for i in range(0, len(evaluations)):
-                str = ", ".join([("{}={:.2f}".format(var, val)) for (var, val) in evaluations[i].items()])
-                logging.info("\t{}: {:.5f}".format(str, float(results[i])))
+            for val, result in zip(evaluations, results):
+                logging.info("\t{}={:.2f}: {:.5f}".format(var, val, result))
 
         if args.plot_file or args.show_plot:
             # Plot
-            evaluations = []
-            xPts = []
-            yPts = []
-            val = 0.05
-            while val < 1:
-                evaluations.append({var: val})
-                xPts.append(val)
-                val += 0.05
-            results = analyse.evaluate_rational_function(ratFunc, evaluations)
-            assert len(evaluations) == len(results)
-            maxVal = 0
-            for i in range(0, len(evaluations)):
-                val = float(results[i])
-                yPts.append(val)
-                maxVal = max(maxVal, val)
+            startTimePlot = time.time()
+            # The expected time grows unboundedly near 0 and 1, thus the plot is restricted to [0.05, 0.95]
+            xPts = numpy.linspace(0.05, 0.95, args.plot_points)
+            yPts = evaluator.evaluate(xPts)
+            logging.info("Evaluated {} points in {:.3f}s".format(len(xPts), time.time() - startTimePlot))
             pyplot.plot(xPts, yPts, 'b-')
-            pyplot.axis([0, 1, 0, math.ceil(maxVal)])
+            pyplot.axis([0, 1, 0, math.ceil(numpy.max(yPts))])
             if args.show_plot:
                 pyplot.show()
             if args.plot_file:
@@ -190,18 +348,15 @@ if __name__ == "__main__":
         optima = analyse.compute_optimum(ratFunc, vars[0])
         filename = args.file if args.file else args.ratfunc
         if len(optima) > 0:
-            for optimum in optima:
-                floatOpt = optimum.as_decimal(10)
-                floatOpt = float(floatOpt.replace("?", ""))
-                logging.debug("Optimum: {} ({:.5f})".format(optimum, floatOpt))
-                valOpt = analyse.evaluate_rational_function(ratFunc, [{var: floatOpt}])[0]
-                logging.info("Optimal value on {} for {} = {:.5f}: {:.5f}".format(os.path.basename(filename), var, floatOpt, float(valOpt)))
+            for floatOpt, valOpt in zip(optima, evaluator.evaluate(optima)):
+                logging.debug("Optimum: {}".format(floatOpt))
+                logging.info("Optimal value on {} for {} = {:.5f}: {:.5f}".format(os.path.basename(filename), var, floatOpt, valOpt))
         else:
             logging.debug("No optimum found.")
-            results = analyse.evaluate_rational_function(ratFunc, [{var: 0 + epsilon}, {var: 1 - epsilon}])
+            results = evaluator.evaluate([0 + epsilon, 1 - epsilon])
             floatOpt = 0.001 if results[0] < results[1] else 1
-            valOpt = analyse.evaluate_rational_function(ratFunc, [{var: floatOpt}])[0]
-            logging.info("Best value on {} for {} = {:.5f}: {:.5f}".format(os.path.basename(filename), var, floatOpt, float(valOpt)))
+            valOpt = float(evaluator.evaluate_exact(floatOpt))
+            logging.info("Best value on {} for {} = {:.5f}: {:.5f}".format(os.path.basename(filename), var, floatOpt, valOpt))
         endTimeOpt = time.time()
 
         # Times
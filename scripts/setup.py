@@ -14,6 +14,6 @@ setup(
     description='optimal-bias-synthesis - Synthesizing optimal probability values for randomized self-stabilising algorithms',
     packages=['finetuning'],
     zip_safe=False,
-    install_requires=['stormpy', 'pycarl', 'matplotlib', 'z3-solver', 'sortedcontainers'],
+    install_requires=['stormpy', 'pycarl', 'matplotlib', 'z3-solver', 'sortedcontainers', 'numpy'],
     python_requires='>=3',
 )
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+pytest.importorskip("stormpy")
+
+import finetuning.cache as cache
+import finetuning.model_io as model_io
+
+
+class FakeModel:
+    nr_states = 3
+    nr_transitions = 5
+
+
+def open_descriptors():
+    if not os.path.isdir("/proc/self/fd"):
+        return None
+    return len(os.listdir("/proc/self/fd"))
+
+
+def fake_export(model, file, model_format):
+    with open(file, 'w') as f:
+        f.write("model")
+
+
+def test_store_and_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_io, "export_model", fake_export)
+    monkeypatch.setattr(model_io, "load_model", lambda file, model_format: open(file).read())
+    model_cache = cache.ModelCache(str(tmp_path))
+    model_cache.store("key", FakeModel(), 2.0, 1.0)
+    assert sorted(os.listdir(str(tmp_path))) == ["key.drn", "key.json"]
+    assert model_cache.load("key") == "model"
+    assert model_cache.hit
+
+
+def test_failed_export_leaves_no_files(tmp_path, monkeypatch):
+    def failing_export(model, file, model_format):
+        raise RuntimeError("export failed")
+
+    monkeypatch.setattr(model_io, "export_model", failing_export)
+    model_cache = cache.ModelCache(str(tmp_path))
+    open_files = open_descriptors()
+    with pytest.raises(RuntimeError):
+        model_cache.store("key", FakeModel(), 2.0, 1.0)
+    assert open_descriptors() == open_files
+    assert os.listdir(str(tmp_path)) == []
+    assert model_cache.load("key") is None
@@ -0,0 +1,80 @@
+import pytest
+
+stormpy = pytest.importorskip("stormpy")
+
+import finetuning.checkpoint as checkpoint
+from finetuning.config import Config
+from finetuning.region import Interval, Point, Region
+
+NAMES = ["p", "q"]
+
+
+def region(p, q):
+    return Region({"p": Interval(*p), "q": Interval(*q)})
+
+
+def encoded(regions):
+    return [r.encode(NAMES) for r in regions]
+
+
+def test_round_trip(tmp_path):
+    file = str(tmp_path / "checkpoint")
+    regions = [region((0.1, 0.5), (0.1, 0.9)), region((0.5, 0.9), (0.1, 0.5))]
+    point_regions = [region((0.3, 0.3), (0.7, 0.7))]
+    best_sample = Point({"p": 0.25, "q": 0.75})
+    cp = checkpoint.Checkpoint(file, "key", 60)
+    cp.save(NAMES, regions, 1.5, 2.25, best_sample, 12, 3, False, point_regions)
+
+    loaded_regions, lower_bound, upper_bound, loaded_sample, no_calls, no_splits, loaded_points = checkpoint.Checkpoint(file, "key", 60).load(False)
+    assert encoded(loaded_regions) == encoded(regions)
+    assert (lower_bound, upper_bound) == (1.5, 2.25)
+    assert loaded_sample.encode(NAMES) == best_sample.encode(NAMES)
+    assert (no_calls, no_splits) == (12, 3)
+    assert encoded(loaded_points) == encoded(point_regions)
+
+    cp.remove()
+    assert not (tmp_path / "checkpoint").exists()
+
+
+def test_round_trip_exact(tmp_path):
+    file = str(tmp_path / "checkpoint")
+    cp = checkpoint.Checkpoint(file, "key", 60)
+    cp.save(NAMES, [region((0.1, 0.9), (0.1, 0.9))], stormpy.Rational("1/3"), stormpy.Rational("7/2"), None, 1, 0, True)
+
+    regions, lower_bound, upper_bound, best_sample, _, _, point_regions = cp.load(True)
+    assert len(regions) == 1
+    assert lower_bound == stormpy.Rational("1/3")
+    assert upper_bound == stormpy.Rational("7/2")
+    assert best_sample is None
+    assert point_regions == []
+
+
+def test_key_mismatch(tmp_path):
+    file = str(tmp_path / "checkpoint")
+    checkpoint.Checkpoint(file, "key", 60).save(NAMES, [], 0.0, 1.0, None, 0, 0, False)
+    with pytest.raises(ValueError):
+        checkpoint.Checkpoint(file, "other key", 60).load(False)
+
+
+def test_save_leaves_no_temporary_files(tmp_path):
+    file = str(tmp_path / "checkpoint")
+    cp = checkpoint.Checkpoint(file, "key", 60)
+    for i in range(2):
+        cp.save(NAMES, [region((0.1, 0.9), (0.1, 0.9))] * i, 0.0, 1.0, None, i, 0, False)
+    assert [f.name for f in tmp_path.iterdir()] == ["checkpoint"]
+    assert len(cp.load(False)[0]) == 1
+
+
+def test_compute_key(tmp_path):
+    model_file = tmp_path / "model.pm"
+    model_file.write_text("dtmc")
+    config = Config(False, 1, 1e-6, 1000)
+    key = checkpoint.Checkpoint.compute_key(str(model_file), config)
+    assert key == checkpoint.Checkpoint.compute_key(str(model_file), config)
+
+    config.eps = config.eps / 2
+    assert checkpoint.Checkpoint.compute_key(str(model_file), config) != key
+    config.eps = config.eps * 2
+
+    model_file.write_text("dtmc\n")
+    assert checkpoint.Checkpoint.compute_key(str(model_file), config) != key
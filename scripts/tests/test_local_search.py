@@ -0,0 +1,57 @@
+from fractions import Fraction
+
+import pytest
+
+import finetuning.local_search as local_search
+
+
+def quadratic(center):
+    return lambda point: sum((value - c) ** 2 for value, c in zip(point, center))
+
+
+def test_minimum_inside_box():
+    value, point, evaluations = local_search.nelder_mead(quadratic((0.3, 0.7)), (0.5, 0.5), 0.0, 1.0, 500)
+    assert point == pytest.approx((0.3, 0.7), abs=1e-4)
+    assert value == pytest.approx(0, abs=1e-8)
+    assert evaluations <= 500 + 2
+
+
+def test_minimum_on_boundary():
+    # The unconstrained minimum lies outside of the box, the search has to stay inside
+    value, point, _ = local_search.nelder_mead(quadratic((1.5, 0.2)), (0.5, 0.5), 0.0, 1.0, 500)
+    assert all(0.0 <= v <= 1.0 for v in point)
+    assert point == pytest.approx((1.0, 0.2), abs=1e-4)
+    assert value == pytest.approx(0.25, abs=1e-6)
+
+
+def test_start_is_clamped():
+    _, point, _ = local_search.nelder_mead(quadratic((0.5,)), (2.0,), 0.0, 1.0, 200)
+    assert point == pytest.approx((0.5,), abs=1e-4)
+
+
+def test_evaluation_limit():
+    calls = []
+
+    def function(point):
+        calls.append(point)
+        return quadratic((0.3, 0.7, 0.1))(point)
+
+    _, _, evaluations = local_search.nelder_mead(function, (0.5, 0.5, 0.5), 0.0, 1.0, 10)
+    assert evaluations == len(calls)
+    # The last step can exceed the limit by at most a shrink of the simplex
+    assert 10 <= evaluations <= 10 + 3
+
+
+def test_result_is_never_worse_than_start():
+    start = (0.9, 0.1)
+    function = quadratic((0.2, 0.6))
+    value, _, _ = local_search.nelder_mead(function, start, 0.0, 1.0, 3)
+    assert value <= function(start)
+
+
+def test_exact_values():
+    # Only comparisons are needed, thus exact function values are supported
+    value, point, _ = local_search.nelder_mead(lambda point: Fraction(point[0]) * (1 - Fraction(point[0])), (0.5,), 0.0, 1.0, 100)
+    assert isinstance(value, Fraction)
+    assert value == min(Fraction(p) * (1 - Fraction(p)) for p in point)
+    assert point[0] in (0.0, 1.0)
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+stormpy = pytest.importorskip("stormpy")
+
+import finetuning.build as build
+import finetuning.model_io as model_io
+import finetuning.pla_helper as pla_helper
+from finetuning.region import Interval, Point, Region
+
+MODEL_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "models", "herman_random_bit", "herman_random_bit-3.pm")
+
+
+def results(model, property):
+    """
+    Compute instantiation results and PLA bounds for a fixed set of points and regions.
+    :param model: Model.
+    :param property: Property.
+    :return: Tuple (list of sample results, list of PLA bounds).
+    """
+    parameters = build.get_parameters(model)
+    env = stormpy.Environment()
+    inst_checker = pla_helper.init_instantiation_checker(model, property, False)
+    initial_state = model.initial_states[0]
+    samples = []
+    for value in [0.1, 0.3, 0.5, 0.7, 0.9]:
+        point = Point({p.name: value for p in parameters})
+        samples.append(inst_checker.check(env, point.carl_valuation(parameters)).at(initial_state))
+    solver = pla_helper.init_solver(None, model, env)
+    bounds = []
+    for lower, upper in [(0.1, 0.4), (0.4, 0.6), (0.6, 0.9)]:
+        region = Region({p.name: Interval(lower, upper) for p in parameters})
+        bounds.append(float(pla_helper.get_bound_region(region, solver, env, parameters, False)))
+    return samples, bounds
+
+
+@pytest.mark.parametrize("model_format", sorted(model_io.FORMATS))
+def test_round_trip(tmp_path, model_format):
+    model, _, property, _, _ = build.build_model(MODEL_FILE)
+    file = str(tmp_path / ("model" + model_io.FORMATS[model_format]))
+    model_io.export_model(model, file, model_format)
+    loaded = model_io.load_model(file)
+
+    assert loaded.nr_states == model.nr_states
+    assert loaded.nr_transitions == model.nr_transitions
+    assert sorted(p.name for p in build.get_parameters(loaded)) == sorted(p.name for p in build.get_parameters(model))
+
+    samples, bounds = results(model, property)
+    samples_loaded, bounds_loaded = results(loaded, property)
+    assert samples_loaded == pytest.approx(samples)
+    assert bounds_loaded == pytest.approx(bounds)
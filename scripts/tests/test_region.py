@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("stormpy")
+
+from finetuning.region import Interval, Point, Region
+
+
+class Variable:
+    def __init__(self, name):
+        self.name = name
+
+
+VARIABLES = [Variable("p"), Variable("q"), Variable("r")]
+NAMES = [var.name for var in VARIABLES]
+
+
+def bounds(region):
+    return {var: (interval.lower, interval.upper) for var, interval in region.intervals.items()}
+
+
+def test_split_widest():
+    region = Region({"p": Interval(0.0, 0.5), "q": Interval(0.25, 1.0), "r": Interval(0.5, 0.75)})
+    lower, upper = region.split(VARIABLES, "widest")
+    assert bounds(lower) == {"p": (0.0, 0.5), "q": (0.25, 0.625), "r": (0.5, 0.75)}
+    assert bounds(upper) == {"p": (0.0, 0.5), "q": (0.625, 1.0), "r": (0.5, 0.75)}
+    # Repeated splitting along the widest variable alternates between the variables
+    assert bounds(lower.split(VARIABLES, "widest")[0])["p"] == (0.0, 0.25)
+
+
+def test_split_all():
+    region = Region({"p": Interval(0.0, 0.5), "q": Interval(0.0, 1.0), "r": Interval(0.5, 0.75)})
+    sub_regions = region.split(VARIABLES)
+    assert len(sub_regions) == 8
+    assert len(set(r.encode(NAMES) for r in sub_regions)) == 8
+
+
+def test_split_collapsed_intervals():
+    region = Region({"p": Interval(0.5, 0.5), "q": Interval(0.0, 0.1), "r": Interval(0.3, 0.3)})
+    assert region.split(VARIABLES, "widest")[0].encode(NAMES) == ((0.5, 0.5), (0.0, 0.05), (0.3, 0.3))
+    assert len(region.split(VARIABLES, "all")) == 2
+    point = Region({"p": Interval(0.5, 0.5), "q": Interval(0.1, 0.1), "r": Interval(0.3, 0.3)})
+    assert point.is_point()
+    assert point.split(VARIABLES, "widest") == []
+    assert point.split(VARIABLES, "all") == []
+
+
+def test_encode_decode_region():
+    region = Region({"q": Interval(0.25, 1.0), "p": Interval(0.0, 0.5), "r": Interval(0.5, 0.75)})
+    encoded = region.encode(NAMES)
+    assert encoded == ((0.0, 0.5), (0.25, 1.0), (0.5, 0.75))
+    decoded = Region.decode(encoded, NAMES)
+    assert bounds(decoded) == bounds(region)
+    for sub_region in region.split(VARIABLES, "widest"):
+        assert bounds(Region.decode(sub_region.encode(NAMES), NAMES)) == bounds(sub_region)
+
+
+def test_encode_decode_point():
+    point = Point({"r": 0.3, "p": 0.1, "q": 0.2})
+    assert point.encode(NAMES) == (0.1, 0.2, 0.3)
+    assert Point.decode(point.encode(NAMES), NAMES).val == point.val
@@ -0,0 +1,103 @@
+import math
+from fractions import Fraction
+
+import pytest
+
+import finetuning.roots as roots
+
+
+def from_roots(*values):
+    """
+    Build the polynomial with the given roots.
+    :param values: Roots.
+    :return: Coefficients.
+    """
+    p = [Fraction(1)]
+    for value in values:
+        # Multiply with (x - value)
+        p = [a - Fraction(value) * b for a, b in zip([Fraction(0)] + p, p + [Fraction(0)])]
+    return p
+
+
+def contains(interval, value):
+    lower, upper = interval
+    return lower <= value <= upper
+
+
+def test_several_roots():
+    p = from_roots(Fraction(1, 10), Fraction(1, 2), Fraction(9, 10), 2, -1)
+    intervals = roots.isolate_roots(p)
+    assert len(intervals) == 3
+    for interval, value in zip(intervals, [Fraction(1, 10), Fraction(1, 2), Fraction(9, 10)]):
+        assert contains(interval, value)
+    assert roots.find_roots(p) == pytest.approx([0.1, 0.5, 0.9])
+
+
+def test_irrational_roots():
+    # x^2 - 1/2 and x^2 - 4x + 1 have the roots 1/sqrt(2) and 2 - sqrt(3) in (0, 1)
+    p = [Fraction(-1, 2), 0, 1]
+    q = [1, -4, 1]
+    product = [sum(p[i] * q[k - i] for i in range(len(p)) if 0 <= k - i < len(q)) for k in range(len(p) + len(q) - 1)]
+    intervals = roots.isolate_roots(product)
+    assert len(intervals) == 2
+    for (lower, upper), value in zip(intervals, [2 - math.sqrt(3), 1 / math.sqrt(2)]):
+        assert lower < upper
+        assert upper - lower <= roots.PRECISION
+        assert lower <= value <= upper
+
+
+def test_roots_at_bounds_are_excluded():
+    p = from_roots(0, 1, Fraction(1, 2))
+    assert roots.isolate_roots(p) == [(Fraction(1, 2), Fraction(1, 2))]
+    assert roots.isolate_roots(from_roots(0, 1)) == []
+
+
+def test_rational_roots_are_exact():
+    # The bisection hits 1/2 and 1/4 exactly
+    assert roots.isolate_roots(from_roots(Fraction(1, 2), Fraction(1, 4))) == [(Fraction(1, 4), Fraction(1, 4)), (Fraction(1, 2), Fraction(1, 2))]
+    # 1/3 is never a bisection point but lies in the isolating interval
+    [(lower, upper)] = roots.isolate_roots(from_roots(Fraction(1, 3)))
+    assert lower <= Fraction(1, 3) <= upper
+
+
+def test_constant_and_zero_polynomial():
+    assert roots.isolate_roots([]) == []
+    assert roots.isolate_roots([Fraction(0), Fraction(0)]) == []
+    assert roots.isolate_roots([Fraction(3)]) == []
+
+
+def test_repeated_roots():
+    p = from_roots(Fraction(1, 3), Fraction(1, 3), Fraction(1, 3), Fraction(3, 4), Fraction(3, 4))
+    assert roots.squarefree(p) == from_roots(Fraction(1, 3), Fraction(3, 4))
+    intervals = roots.isolate_roots(p)
+    assert len(intervals) == 2
+    assert contains(intervals[0], Fraction(1, 3))
+    assert contains(intervals[1], Fraction(3, 4))
+
+
+def test_squarefree_keeps_squarefree_polynomial():
+    p = from_roots(Fraction(1, 5), Fraction(2, 5))
+    assert roots.squarefree(p) == p
+
+
+def test_normalize():
+    p = from_roots(Fraction(1, 2), Fraction(2, 3))
+    expected = (2, -7, 6)
+    assert roots.normalize(p) == expected
+    # Scaling, leading zeros and repeated roots do not change the normal form
+    assert roots.normalize([-Fraction(5, 3) * coeff for coeff in p] + [Fraction(0)]) == expected
+    assert roots.normalize(from_roots(Fraction(1, 2), Fraction(1, 2), Fraction(2, 3))) == expected
+    assert roots.normalize([Fraction(-4)]) == (1,)
+    assert roots.normalize([]) == ()
+
+
+def test_agreement_with_z3():
+    pytest.importorskip("z3")
+    pytest.importorskip("stormpy")
+    import finetuning.analyse as analyse
+
+    # Derivative (x - 1/3) * (x^2 - 1/2) with a rational and an irrational root in (0, 1)
+    p = [Fraction(1, 6), Fraction(-1, 2), Fraction(-1, 3), Fraction(1)]
+    optima = analyse.find_optimum_z3_smt2("(* (- x (/ 1.0 3.0)) (- (* x x) 0.5))", "x")
+    expected = sorted(float(opt.as_decimal(20).rstrip("?")) for opt in optima)
+    assert roots.find_roots(p) == pytest.approx(expected, abs=1e-12)
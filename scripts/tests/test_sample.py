@@ -0,0 +1,106 @@
+import pytest
+
+pytest.importorskip("stormpy")
+
+import finetuning.sample as sample
+from finetuning.region import Point
+
+
+class Parameter:
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+PARAMETERS = [Parameter("p"), Parameter("q")]
+
+
+def samples(values):
+    return [(Point({"p": p, "q": q}), result) for p, q, result in values]
+
+
+def test_resume_complete_file(tmp_path):
+    csv_file = str(tmp_path / "samples.csv")
+    sample.export_csv(csv_file, samples([(0.1, 0.2, 1.5), (0.3, 0.4, 2.5)]), PARAMETERS)
+    content = open(csv_file).read()
+    assert sample.resume_csv(csv_file, PARAMETERS) == 2
+    assert open(csv_file).read() == content
+
+
+def test_resume_removes_incomplete_row(tmp_path):
+    csv_file = str(tmp_path / "samples.csv")
+    sample.export_csv(csv_file, samples([(0.1, 0.2, 1.5)]), PARAMETERS)
+    with open(csv_file, 'a') as f:
+        f.write("0.3;0.")
+    assert sample.resume_csv(csv_file, PARAMETERS) == 1
+    assert sample.export_csv(csv_file, samples([(0.3, 0.4, 2.5)]), PARAMETERS, append=True) == 1
+    assert open(csv_file).read() == "p;q;sample\n0.1;0.2;1.5\n0.3;0.4;2.5\n"
+
+
+def test_resume_incomplete_header(tmp_path):
+    csv_file = str(tmp_path / "samples.csv")
+    with open(csv_file, 'w') as f:
+        f.write("p;q;sam")
+    assert sample.resume_csv(csv_file, PARAMETERS) == 0
+    sample.export_csv(csv_file, samples([(0.1, 0.2, 1.5)]), PARAMETERS, append=True)
+    assert open(csv_file).read() == "p;q;sample\n0.1;0.2;1.5\n"
+
+
+def test_resume_different_parameters(tmp_path):
+    csv_file = str(tmp_path / "samples.csv")
+    sample.export_csv(csv_file, samples([(0.1, 0.2, 1.5)]), PARAMETERS)
+    with pytest.raises(ValueError):
+        sample.resume_csv(csv_file, [Parameter("p"), Parameter("r")])
+
+
+def evaluator(function, calls):
+    def evaluate(points):
+        calls.append(len(points))
+        return [function(point.val["p"], point.val["q"]) for point in points]
+    return evaluate
+
+
+def valley(p, q):
+    return abs(p - 0.7) + abs(q - 0.3)
+
+
+@pytest.mark.parametrize("cells_per_step", [1, 4])
+def test_adaptive_sampling_respects_budget(cells_per_step):
+    calls = []
+    sampler = sample.AdaptiveSampler(PARAMETERS, evaluator(valley, calls), 100, cells_per_step=cells_per_step)
+    results = list(sampler.sample(2))
+    points = [(point.val["p"], point.val["q"]) for point, _ in results]
+    assert len(points) == len(set(points)) == sampler.no_samples == sum(calls)
+    # Initial grid with 4x4 points
+    assert calls[0] == 16
+    # Sampling only stops if the new corners of a single refinement (at most 5 in 2D) do not fit into the budget
+    assert 100 - 5 < len(points) <= 100
+    for point, result in results:
+        assert result == valley(point.val["p"], point.val["q"])
+
+
+def test_adaptive_sampling_refines_near_minimum():
+    sampler = sample.AdaptiveSampler(PARAMETERS, evaluator(valley, []), 200)
+    results = list(sampler.sample(2))
+    assert min(result for _, result in results) < 0.05
+    cells = sampler.final_cells()
+    # The cells cover the sampled area
+    area = sum((cell.intervals["p"].upper - cell.intervals["p"].lower) * (cell.intervals["q"].upper - cell.intervals["q"].lower) for cell, _, _ in cells)
+    assert area == pytest.approx((1 - 2e-10) ** 2)
+    # Cells containing the minimum are refined more than cells far away from it
+    minimum = Point({"p": 0.7, "q": 0.3})
+    corner = Point({"p": 1e-10, "q": 1 - 1e-10})
+    width_minimum = min(sampler.width(cell) for cell, _, _ in cells if cell.contains(minimum))
+    width_corner = max(sampler.width(cell) for cell, _, _ in cells if cell.contains(corner))
+    assert width_minimum < width_corner
+    for cell, low, high in cells:
+        values = [valley(p, q) for p, q in sampler.corners(cell)]
+        assert (low, high) == (min(values), max(values))
+
+
+def test_adaptive_sampling_budget_too_small():
+    sampler = sample.AdaptiveSampler(PARAMETERS, evaluator(valley, []), 10)
+    with pytest.raises(ValueError):
+        list(sampler.sample(2))